@@ -0,0 +1,120 @@
+# autocomplete.py - префиксный индекс для подсказок поиска
+import re
+import threading
+from bisect import bisect_left
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+from data_version import SALONS, get_version
+
+SALON_LIMIT = 10
+CATEGORY_LIMIT = 5
+DISTRICT_LIMIT = 5
+
+_TOKEN_END = chr(0x10FFFF)
+
+
+def normalize(text: str) -> str:
+    return text.casefold().replace("ё", "е")
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"\w+", normalize(text))
+
+
+class PrefixIndex:
+    """Отсортированный массив токенов; поиск префикса - два bisect"""
+    __slots__ = ("version", "entries", "tokens", "refs")
+
+    def __init__(self, version: int, entries: List[dict]):
+        self.version = version
+        self.entries = tuple(entries)
+        pairs = sorted(
+            (token, position)
+            for position, entry in enumerate(self.entries)
+            for token in set(tokenize(entry["name"]))
+        )
+        self.tokens = tuple(token for token, _ in pairs)
+        self.refs = tuple(position for _, position in pairs)
+
+    def _prefix_matches(self, prefix: str) -> set:
+        start = bisect_left(self.tokens, prefix)
+        end = bisect_left(self.tokens, prefix + _TOKEN_END, start)
+        return set(self.refs[start:end])
+
+    def search(self, query: str) -> List[dict]:
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        # Каждое слово запроса должно быть началом какого-то слова в названии
+        matched = self._prefix_matches(query_tokens[0])
+        for token in query_tokens[1:]:
+            if not matched:
+                break
+            matched &= self._prefix_matches(token)
+
+        limits = {"salon": SALON_LIMIT, "category": CATEGORY_LIMIT, "district": DISTRICT_LIMIT}
+        grouped = {"salon": [], "category": [], "district": []}
+        for position in sorted(matched):
+            entry = self.entries[position]
+            bucket = grouped[entry["type"]]
+            if len(bucket) < limits[entry["type"]]:
+                bucket.append(entry)
+        return grouped["salon"] + grouped["category"] + grouped["district"]
+
+
+def build_index(db: Session) -> PrefixIndex:
+    version = get_version(db, SALONS)
+    rows = db.execute(
+        select(
+            models.Salon.id,
+            models.Salon.name,
+            models.Salon.rating,
+            models.Salon.category,
+            models.Salon.district,
+        ).order_by(models.Salon.id)
+    ).all()
+
+    entries = []
+    categories = {}
+    districts = {}
+    for row in rows:
+        if row.name:
+            entries.append({
+                "type": "salon",
+                "id": row.id,
+                "name": row.name,
+                "rating": row.rating,
+                "category": row.category,
+                "icon": "bi-shop",
+            })
+        if row.category:
+            categories[row.category] = None
+        if row.district:
+            districts[row.district] = None
+
+    entries += [{"type": "category", "name": name, "icon": "bi-tag"} for name in categories]
+    entries += [{"type": "district", "name": name, "icon": "bi-geo-alt"} for name in districts]
+    return PrefixIndex(version, entries)
+
+
+_index: Optional[PrefixIndex] = None
+_rebuild_lock = threading.Lock()
+
+
+def get_autocomplete_index(db: Session) -> PrefixIndex:
+    """Актуальный индекс; перестраивается при смене версии данных салонов"""
+    global _index
+    version = get_version(db, SALONS)
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _rebuild_lock:
+        if _index is None or _index.version != version:
+            _index = build_index(db)
+        return _index
@@ -0,0 +1,579 @@
+# benchmark.py - нагрузочный тест публичных страниц: RPS, перцентили задержки, запросы к БД
+#
+# python benchmark.py                                 # приложение в этом же процессе
+# python benchmark.py --server uvicorn --workers 4    # отдельный uvicorn, настоящий HTTP
+# python benchmark.py --url http://127.0.0.1:8000     # уже запущенный сервер
+# python benchmark.py --scale 10 --output before.json # сначала seed_bulk.py --scale 10
+# python benchmark.py --compare before.json           # сравнение с прошлым прогоном
+#
+# В режиме in-process обработчики работают в одном цикле событий с клиентом, поэтому
+# абсолютный RPS ниже, чем у сервера, зато считаются SQL-запросы на каждый маршрут.
+# У сервера количество запросов берется из Server-Timing (SQL_PROFILING=1).
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import asyncio
+import contextvars
+import json
+import platform
+import random
+import re
+import socket
+import subprocess
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote, urlencode, urlsplit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (маршрут, вес в смеси); вес - доля запросов при обычном трафике
+MIX = [
+    ("/", 15),
+    ("/catalog", 20),
+    ("/catalog/search", 5),
+    ("/catalog/{salon_id}", 20),
+    ("/blog", 10),
+    ("/blog/{slug}", 15),
+    ("/api/search/autocomplete", 10),
+    ("/api/blog/search", 5),
+]
+
+SORTS = ("popular", "rating", "reviews", "name")
+RATINGS = ("3", "4", "4.5")
+
+# Запрос: (метод, путь с query string, тело формы или None)
+Request = Tuple[str, str, Optional[dict]]
+
+
+class Samples:
+    """Реальные значения из БД для параметров запросов"""
+
+    def __init__(self, salon_ids, categories, districts, slugs, blog_categories, tags, words):
+        self.salon_ids = salon_ids or [1]
+        self.categories = categories
+        self.districts = districts
+        self.slugs = slugs or ["missing"]
+        self.blog_categories = blog_categories
+        self.tags = tags
+        self.words = words or ["салон"]
+
+
+def load_samples(limit: int = 2000) -> Samples:
+    from sqlalchemy import func, select
+
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        def column(col, where=None):
+            query = select(col).distinct()
+            if where is not None:
+                query = query.where(where)
+            return [value for value in db.execute(query.order_by(func.random()).limit(limit)).scalars() if value]
+
+        published = models.BlogPost.is_published == True
+        titles = column(models.Salon.name) + column(models.BlogPost.title, published)
+        words = sorted({word for title in titles for word in title.split() if len(word) >= 4 and word.isalpha()})
+        return Samples(
+            salon_ids=column(models.Salon.id),
+            categories=column(models.Salon.category),
+            districts=column(models.Salon.district),
+            slugs=column(models.BlogPost.slug, published),
+            blog_categories=column(models.BlogPost.category, published),
+            # /blog?tag= фильтрует по имени тега (crud.blog_posts_query)
+            tags=column(models.BlogTag.name),
+            words=words,
+        )
+    finally:
+        db.close()
+
+
+def _url(path: str, params: Dict[str, object]) -> str:
+    params = {key: value for key, value in params.items() if value not in (None, "")}
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+def _maybe(rng: random.Random, values, probability: float):
+    return rng.choice(values) if values and rng.random() < probability else None
+
+
+def _prefix(rng: random.Random, samples: Samples) -> str:
+    word = rng.choice(samples.words)
+    return word[: rng.randint(2, min(len(word), 6))]
+
+
+def catalog_request(rng: random.Random, samples: Samples) -> Request:
+    # Комбинации фильтров как у пользователей: чаще без фильтров или с одним
+    return "GET", _url("/catalog", {
+        "category": _maybe(rng, samples.categories, 0.4),
+        "district": _maybe(rng, samples.districts, 0.4),
+        "min_rating": _maybe(rng, RATINGS, 0.2),
+        "sort_by": rng.choice(SORTS) if rng.random() < 0.3 else None,
+        "page": rng.randint(2, 5) if rng.random() < 0.2 else None,
+    }), None
+
+
+def blog_request(rng: random.Random, samples: Samples) -> Request:
+    choice = rng.random()
+    params = {}
+    if choice < 0.25:
+        params["category"] = _maybe(rng, samples.blog_categories, 1.0)
+    elif choice < 0.4:
+        params["tag"] = _maybe(rng, samples.tags, 1.0)
+    elif choice < 0.5:
+        params["search"] = rng.choice(samples.words)
+    if rng.random() < 0.2:
+        params["page"] = rng.randint(2, 4)
+    return "GET", _url("/blog", params), None
+
+
+GENERATORS: Dict[str, Callable[[random.Random, Samples], Request]] = {
+    "/": lambda rng, samples: ("GET", "/", None),
+    "/catalog": catalog_request,
+    "/catalog/search": lambda rng, samples: (
+        "POST", "/catalog/search", {"search_query": rng.choice(samples.words)}
+    ),
+    "/catalog/{salon_id}": lambda rng, samples: (
+        "GET", f"/catalog/{rng.choice(samples.salon_ids)}", None
+    ),
+    "/blog": blog_request,
+    "/blog/{slug}": lambda rng, samples: (
+        "GET", f"/blog/{quote(rng.choice(samples.slugs))}", None
+    ),
+    "/api/search/autocomplete": lambda rng, samples: (
+        "GET", _url("/api/search/autocomplete", {"q": _prefix(rng, samples)}), None
+    ),
+    "/api/blog/search": lambda rng, samples: (
+        "GET", _url("/api/blog/search", {"q": _prefix(rng, samples)}), None
+    ),
+}
+
+
+# --- Счетчик SQL-запросов (только in-process) ---
+
+_query_counter: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("bench_queries", default=None)
+
+
+def install_query_counter():
+    """Считает выполнения курсора в счетчик текущего запроса (все движки приложения)"""
+    from sqlalchemy import event
+
+    from database import async_engine, engine, read_engine
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        counter = _query_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+    for target in (engine, read_engine, async_engine.sync_engine):
+        event.listen(target, "before_cursor_execute", _count)
+
+
+# --- Клиенты ---
+
+_SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+class InProcessClient:
+    """Вызывает ASGI-приложение напрямую, без сети"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, url: str, form: Optional[dict]) -> Tuple[int, int, Optional[int]]:
+        path, _, query_string = url.partition("?")
+        body = urlencode(form).encode() if form is not None else b""
+        headers = [(b"host", b"benchmark")]
+        if form is not None:
+            headers += [
+                (b"content-type", b"application/x-www-form-urlencoded"),
+                (b"content-length", str(len(body)).encode()),
+            ]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": unquote(path),
+            "raw_path": path.encode("ascii"),
+            "query_string": query_string.encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("benchmark", 80),
+        }
+        done = asyncio.Event()
+        received = False
+        status = 0
+        size = 0
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if not message.get("more_body"):
+                    done.set()
+
+        counter = [0]
+        token = _query_counter.set(counter)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _query_counter.reset(token)
+            done.set()
+        return status, size, counter[0]
+
+    async def close(self):
+        pass
+
+
+class HttpClient:
+    """Минимальный HTTP/1.1 клиент с keep-alive: одно соединение на конкурентного клиента"""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    async def _connection(self):
+        if self._idle:
+            return self._idle.pop()
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, url: str, form: Optional[dict]) -> Tuple[int, int, Optional[int]]:
+        reader, writer = await self._connection()
+        body = urlencode(form).encode() if form is not None else b""
+        head = f"{method} {url} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+        if form is not None:
+            head += "Content-Type: application/x-www-form-urlencoded\r\n"
+        head += f"Content-Length: {len(body)}\r\n\r\n"
+        try:
+            writer.write(head.encode("ascii") + body)
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if headers.get("transfer-encoding") == "chunked":
+                size = 0
+                while True:
+                    chunk = int((await reader.readline()).strip(), 16)
+                    await reader.readexactly(chunk + 2)
+                    size += chunk
+                    if chunk == 0:
+                        break
+            else:
+                size = int(headers.get("content-length", 0))
+                if method != "HEAD":
+                    await reader.readexactly(size)
+        except Exception:
+            writer.close()
+            raise
+
+        if headers.get("connection") == "close":
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        queries = _SERVER_TIMING_QUERIES.search(headers.get("server-timing", ""))
+        return status, size, int(queries.group(1)) if queries else None
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+def start_uvicorn(port: int, workers: int, env: dict) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BASE_DIR,
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn завершился с кодом {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn не начал принимать соединения за 60 с")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# --- Прогон и отчет ---
+
+class RouteStats:
+    __slots__ = ("latencies", "statuses", "queries", "bytes", "errors")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Counter = Counter()
+        self.queries: List[int] = []
+        self.bytes = 0
+        self.errors: Counter = Counter()
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу; values уже отсортированы"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(q / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def plan_requests(count: int, samples: Samples, seed: int) -> List[Tuple[str, Request]]:
+    rng = random.Random(seed)
+    routes = [route for route, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    return [
+        (route, GENERATORS[route](rng, samples))
+        for route in rng.choices(routes, weights=weights, k=count)
+    ]
+
+
+async def run_load(client, plan: List[Tuple[str, Request]], concurrency: int) -> Tuple[Dict[str, RouteStats], float]:
+    stats: Dict[str, RouteStats] = defaultdict(RouteStats)
+    position = 0
+
+    async def worker():
+        nonlocal position
+        while position < len(plan):
+            route, (method, url, form) = plan[position]
+            position += 1
+            route_stats = stats[route]
+            started = time.perf_counter()
+            try:
+                status, size, queries = await client.request(method, url, form)
+            except Exception as error:
+                route_stats.errors[type(error).__name__] += 1
+                continue
+            route_stats.latencies.append(time.perf_counter() - started)
+            route_stats.statuses[status] += 1
+            route_stats.bytes += size
+            if queries is not None:
+                route_stats.queries.append(queries)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return stats, time.perf_counter() - started
+
+
+def summarize(latencies: List[float], elapsed: float, requests: int) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": requests,
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def build_report(stats: Dict[str, RouteStats], elapsed: float, meta: dict) -> dict:
+    routes = {}
+    for route, _ in MIX:
+        route_stats = stats.get(route)
+        if route_stats is None:
+            continue
+        done = len(route_stats.latencies)
+        summary = summarize(route_stats.latencies, elapsed, done)
+        summary["errors"] = sum(route_stats.errors.values())
+        summary["exceptions"] = dict(route_stats.errors)
+        summary["statuses"] = {str(status): count for status, count in sorted(route_stats.statuses.items())}
+        summary["avg_bytes"] = route_stats.bytes // done if done else 0
+        if route_stats.queries:
+            queries = sorted(route_stats.queries)
+            summary["queries_avg"] = round(sum(queries) / len(queries), 2)
+            summary["queries_max"] = queries[-1]
+        routes[route] = summary
+
+    all_latencies = [latency for route_stats in stats.values() for latency in route_stats.latencies]
+    total = summarize(all_latencies, elapsed, len(all_latencies))
+    total["errors"] = sum(sum(route_stats.errors.values()) for route_stats in stats.values())
+    total["elapsed_s"] = round(elapsed, 3)
+    return {"meta": meta, "total": total, "routes": routes}
+
+
+def format_report(report: dict, baseline: Optional[dict] = None) -> str:
+    def delta(current: dict, previous: Optional[dict], key: str) -> str:
+        if not previous or not previous.get(key):
+            return ""
+        change = (current[key] - previous[key]) / previous[key] * 100
+        return f" ({change:+.0f}%)"
+
+    lines = [
+        f"{'маршрут':<26} {'запр.':>6} {'RPS':>16} {'p50 мс':>9} {'p95 мс':>18} {'p99 мс':>9} {'SQL':>6} {'ошибки':>7}"
+    ]
+    base_routes = (baseline or {}).get("routes", {})
+    rows = list(report["routes"].items()) + [("ВСЕГО", report["total"])]
+    for route, summary in rows:
+        previous = baseline.get("total") if baseline and route == "ВСЕГО" else base_routes.get(route)
+        non_2xx = sum(
+            count for status, count in summary.get("statuses", {}).items() if not status.startswith(("2", "3"))
+        )
+        lines.append(
+            f"{route:<26} {summary['requests']:>6} "
+            f"{str(summary['rps']) + delta(summary, previous, 'rps'):>16} {summary['p50_ms']:>9} "
+            f"{str(summary['p95_ms']) + delta(summary, previous, 'p95_ms'):>18} {summary['p99_ms']:>9} "
+            f"{summary.get('queries_avg', '-'):>6} {summary['errors'] + non_2xx:>7}"
+        )
+    return "\n".join(lines)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def data_counts() -> dict:
+    from sqlalchemy import func, select
+
+    import models
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return {
+            name: db.execute(select(func.count()).select_from(model)).scalar()
+            for name, model in (
+                ("salons", models.Salon), ("reviews", models.Review), ("blog_posts", models.BlogPost),
+            )
+        }
+    finally:
+        db.close()
+
+
+async def benchmark(args) -> dict:
+    samples = load_samples()
+    plan = plan_requests(args.requests, samples, args.seed)
+    warmup = plan_requests(args.warmup, samples, args.seed + 1)
+
+    process = None
+    if args.url:
+        client, mode = HttpClient(args.url), "http"
+    elif args.server == "uvicorn":
+        # SQL_PROFILING - счетчик запросов в Server-Timing для каждого маршрута
+        env = {"RESPONSE_CACHE": "1" if args.response_cache else "0", "SQL_PROFILING": "1"}
+        port = free_port()
+        process = start_uvicorn(port, args.workers, env)
+        client, mode = HttpClient(f"http://127.0.0.1:{port}"), "uvicorn"
+    else:
+        from main import app
+
+        install_query_counter()
+        await app.router.startup()
+        client, mode = InProcessClient(app), "in-process"
+
+    try:
+        await run_load(client, warmup, args.concurrency)
+        stats, elapsed = await run_load(client, plan, args.concurrency)
+    finally:
+        await client.close()
+        if process is not None:
+            process.terminate()
+            process.wait()
+        elif mode == "in-process":
+            await app.router.shutdown()
+
+    meta = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "mode": mode,
+        "workers": args.workers if mode == "uvicorn" else None,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "response_cache": args.response_cache,
+        "data": data_counts(),
+        "python": platform.python_version(),
+    }
+    return build_report(stats, elapsed, meta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест публичных маршрутов")
+    parser.add_argument("--server", choices=("in-process", "uvicorn"), default="in-process")
+    parser.add_argument("--url", help="адрес уже запущенного сервера (вместо --server)")
+    parser.add_argument("--workers", type=int, default=1, help="воркеров uvicorn")
+    parser.add_argument("--concurrency", type=int, default=16, help="одновременных клиентов")
+    parser.add_argument("--requests", type=int, default=2000, help="запросов в замере")
+    parser.add_argument("--warmup", type=int, default=200, help="запросов прогрева (не входят в отчет)")
+    parser.add_argument("--seed", type=int, default=42, help="seed генератора смеси запросов")
+    parser.add_argument("--scale", type=float,
+                        help="перед прогоном перезаполнить site.db через seed_bulk.py с этим масштабом")
+    parser.add_argument("--response-cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="кэш HTML-ответов (RESPONSE_CACHE)")
+    parser.add_argument("--output", help="файл для результатов в JSON")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    # config читает окружение при импорте - до загрузки модулей приложения
+    os.environ["RESPONSE_CACHE"] = "1" if args.response_cache else "0"
+    if args.scale is not None:
+        from seed_bulk import seed_bulk
+
+        seed_bulk(args.scale)
+    if not args.url:
+        # Воркеры приложения миграции не выполняют - один раз перед запуском
+        from database import engine
+        from migrations import prepare_database
+
+        prepare_database(engine)
+        engine.dispose()
+
+    report = asyncio.run(benchmark(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+    print(format_report(report, baseline))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# blog_listing.py - страница списка статей блога и данные сайдбара
+import math
+from typing import Optional
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.orm import Session
+
+import crud
+import models
+from cache_backend import cache
+from data_version import BLOG, get_version
+from pagination import BLOG_SORT, count_cache, keyset_page
+from view_counter import view_counter
+
+# Категории и теги меняются только вместе с версией блога,
+# популярные статьи - еще и от просмотров, поэтому живут недолго
+TAXONOMY_TTL = 600.0
+POSTS_TTL = 30.0
+
+SIDEBAR_KEYS = ("categories", "popular_posts", "recent_posts", "popular_tags")
+
+
+def get_blog_page(
+    db: Session,
+    page: int = 1,
+    per_page: int = 6,
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    search: Optional[str] = None,
+    after: Optional[str] = None,
+    version: Optional[int] = None,
+) -> dict:
+    """Статьи страницы и общее количество по всем фильтрам сразу"""
+    if version is None:
+        version = get_version(db, BLOG)
+    query = crud.blog_posts_query(db, category=category, tag=tag, search=search)
+
+    # Количество - по тем же фильтрам, кэшируется до изменения блога
+    total_items = count_cache.get(
+        db, BLOG, ("blog", category, tag, search), lambda: query.order_by(None).count(), version
+    )
+    total_pages = max(1, math.ceil(total_items / per_page))
+
+    next_cursor = None
+    if search:
+        # Результаты поиска упорядочены по релевантности - обычный OFFSET
+        posts = (
+            query.order_by(models.BlogPost.created_at.desc())
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+            .all()
+        )
+    elif after or page == 1:
+        # Курсор по (created_at, id): глубокие страницы не дороже первой
+        posts, next_cursor = keyset_page(query, BLOG_SORT, after, per_page)
+    else:
+        posts = (
+            query.order_by(models.BlogPost.created_at.desc(), models.BlogPost.id.desc())
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+            .all()
+        )
+
+    return {
+        "posts": posts,
+        "total_items": total_items,
+        "total_pages": total_pages,
+        "next_cursor": next_cursor,
+    }
+
+
+def _post_dict(post: models.BlogPost) -> dict:
+    return {
+        "id": post.id,
+        "slug": post.slug,
+        "title": post.title,
+        "image_url": post.image_url,
+        "created_at": post.created_at,
+        "views_count": post.views_count,
+    }
+
+
+def load_taxonomy(db: Session, tags_limit: int = 10) -> dict:
+    """Категории с количеством статей и популярные теги - одним запросом"""
+    categories = select(
+        literal("category").label("kind"),
+        models.BlogPost.category.label("name"),
+        literal(None).label("slug"),
+        func.count(models.BlogPost.id).label("count"),
+    ).where(
+        models.BlogPost.is_published == True
+    ).group_by(models.BlogPost.category)
+
+    tags = select(
+        literal("tag").label("kind"),
+        models.BlogTag.name.label("name"),
+        models.BlogTag.slug.label("slug"),
+        func.count(models.post_tags.c.post_id).label("count"),
+    ).join(
+        models.post_tags, models.post_tags.c.tag_id == models.BlogTag.id
+    ).group_by(models.BlogTag.id)
+
+    result = {"categories": [], "popular_tags": []}
+    for row in db.execute(union_all(categories, tags)):
+        if row.kind == "category" and row.name:
+            result["categories"].append({"name": row.name, "count": row.count})
+        elif row.kind == "tag":
+            result["popular_tags"].append({"name": row.name, "slug": row.slug, "count": row.count})
+
+    result["popular_tags"].sort(key=lambda tag: -tag["count"])
+    del result["popular_tags"][tags_limit:]
+    return result
+
+
+def load_sidebar_posts(db: Session, limit: int = 2) -> dict:
+    """Популярные и свежие статьи - одним запросом по объединению обоих топов"""
+    published = models.BlogPost.is_published == True
+    popular_ids = select(models.BlogPost.id).where(published).order_by(
+        models.BlogPost.views_count.desc()
+    ).limit(limit)
+    recent_ids = select(models.BlogPost.id).where(published).order_by(
+        models.BlogPost.created_at.desc()
+    ).limit(limit)
+
+    # Статьи с еще не записанными просмотрами могут обогнать топ из БД
+    candidate_ids = union_all(popular_ids.subquery().select(), recent_ids.subquery().select())
+    condition = models.BlogPost.id.in_(candidate_ids)
+    pending_ids = list(view_counter.pending())
+    if pending_ids:
+        condition = condition | (published & models.BlogPost.id.in_(pending_ids))
+
+    posts = db.query(models.BlogPost).filter(condition).all()
+    return {
+        "popular_posts": [
+            _post_dict(post)
+            for post in sorted(posts, key=lambda post: post.views_count or 0, reverse=True)[:limit]
+        ],
+        "recent_posts": [
+            _post_dict(post)
+            for post in sorted(
+                (post for post in posts if post.is_published),
+                key=lambda post: post.created_at,
+                reverse=True,
+            )[:limit]
+        ],
+    }
+
+
+def get_blog_sidebar(db: Session, version: Optional[int] = None) -> dict:
+    """Данные сайдбара; таксономия и статьи кэшируются отдельно и независимо от страницы"""
+    if version is None:
+        version = get_version(db, BLOG)
+    taxonomy = cache.get_or_set(f"blog-taxonomy:{version}", lambda: load_taxonomy(db), TAXONOMY_TTL)
+    posts = cache.get_or_set(f"blog-sidebar-posts:{version}", lambda: load_sidebar_posts(db), POSTS_TTL)
+    return {**taxonomy, **posts}
@@ -0,0 +1,338 @@
+# cache_backend.py - общий интерфейс кэша и его реализации
+#
+# memory - LRU в памяти процесса (у каждого воркера gunicorn свой);
+# sqlite - файл на диске, общий для всех воркеров на сервере;
+# redis  - любой сервер с протоколом Redis, общий для нескольких серверов.
+#
+# Значения сериализуются pickle - в общий кэш пишет только само приложение.
+import logging
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+import config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class RedisError(Exception):
+    pass
+
+
+# Сбои хранилища (Redis недоступен, таймаут сокета, заблокирован cache.db,
+# испорченная запись) - для приложения это промах, а не ошибка 500
+BACKEND_ERRORS = (OSError, sqlite3.Error, RedisError, pickle.UnpicklingError, EOFError)
+
+
+class CacheBackend(ABC):
+    """Базовый интерфейс: ключи - строки, значения - любые picklable-объекты"""
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    def safe_get(self, key: str, default: Any = None) -> Any:
+        """get, при сбое хранилища - default (промах)"""
+        try:
+            return self.get(key, default)
+        except BACKEND_ERRORS:
+            logger.warning("Кэш недоступен: чтение %s", key, exc_info=True)
+            return default
+
+    def safe_set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """set, при сбое хранилища значение просто не сохраняется"""
+        try:
+            self.set(key, value, ttl)
+            return True
+        except BACKEND_ERRORS:
+            logger.warning("Кэш недоступен: запись %s", key, exc_info=True)
+            return False
+
+    def get_or_set(self, key: str, build, ttl: Optional[float] = None) -> Any:
+        try:
+            value = self.get(key, _MISSING)
+        except BACKEND_ERRORS:
+            # Хранилище недоступно - строим значение и не пытаемся его записать
+            logger.warning("Кэш недоступен: чтение %s", key, exc_info=True)
+            metrics.cache_lookup(key.split(":", 1)[0], False)
+            return build()
+        # Метка - префикс ключа до ":" (home, blog-taxonomy, ...)
+        metrics.cache_lookup(key.split(":", 1)[0], value is not _MISSING)
+        if value is _MISSING:
+            value = build()
+            self.safe_set(key, value, ttl)
+        return value
+
+
+class MemoryBackend(CacheBackend):
+    """LRU в памяти процесса; объекты хранятся без сериализации"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend(CacheBackend):
+    """Кэш в отдельном файле SQLite (WAL) - общий для воркеров одного сервера"""
+
+    PRUNE_EVERY = 200
+    # Время последнего обращения обновляется не чаще раза в N секунд на ключ -
+    # горячие ключи не превращают каждое чтение в запись
+    ACCESS_RESOLUTION = 1.0
+
+    def __init__(self, path: str, max_entries: int = 10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # autocommit: каждая запись - отдельная короткая транзакция
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key, default=None):
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT value, expires, accessed FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        now = time.time()
+        if expires is not None and expires <= now:
+            self.delete(key)
+            return default
+        if now - accessed >= self.ACCESS_RESOLUTION:
+            # LRU: prune() удаляет записи, к которым дольше всего не обращались
+            connection.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + ttl if ttl else None, now),
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key):
+        self._connection().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+
+    def prune(self):
+        """Удаляет просроченные записи и давно не читавшиеся сверх лимита"""
+        connection = self._connection()
+        connection.execute("DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+        connection.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+class RedisBackend(CacheBackend):
+    """Минимальный клиент протокола Redis (RESP): GET, SET PX, DEL, SCAN"""
+
+    # Пауза перед новой попыткой подключения к недоступному серверу, сек.
+    RETRY_AFTER = 5.0
+
+    def __init__(self, url: str, prefix: str = "beauty:", timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    # --- протокол ---
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._local.sock = sock
+        self._local.reader = sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _reset(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+        self._local.reader = None
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line:
+            raise ConnectionError("Redis закрыл соединение")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            size = int(payload)
+            if size < 0:
+                return None
+            data = self._local.reader.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(payload)
+            if size < 0:
+                return None
+            return [self._read() for _ in range(size)]
+        raise RedisError(f"Неизвестный ответ: {line!r}")
+
+    def _call(self, *args):
+        self._local.sock.sendall(self._encode(*args))
+        return self._read()
+
+    def execute(self, *args):
+        # Недоступный сервер не переспрашиваем на каждом запросе: каждая попытка
+        # подключения - до timeout секунд ожидания
+        if time.monotonic() < self._down_until:
+            raise ConnectionError("Redis недоступен")
+        # Одно переподключение при обрыве соединения
+        for attempt in (1, 2):
+            if getattr(self._local, "sock", None) is None:
+                try:
+                    self._connect()
+                except (OSError, RedisError):
+                    self._reset()
+                    self._down_until = time.monotonic() + self.RETRY_AFTER
+                    raise
+            try:
+                return self._call(*args)
+            except (ConnectionError, OSError):
+                self._reset()
+                if attempt == 2:
+                    raise
+
+    # --- интерфейс кэша ---
+
+    def get(self, key, default=None):
+        value = self.execute("GET", self.prefix + key)
+        if value is None:
+            return default
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if ttl:
+            self.execute("SET", self.prefix + key, data, "PX", max(1, int(ttl * 1000)))
+        else:
+            self.execute("SET", self.prefix + key, data)
+
+    def delete(self, key):
+        self.execute("DEL", self.prefix + key)
+
+    def clear(self):
+        cursor = b"0"
+        while True:
+            cursor, keys = self.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 500)
+            if keys:
+                self.execute("DEL", *keys)
+            if cursor == b"0":
+                break
+
+
+def create_backend(kind: str, url: Optional[str] = None, max_entries: int = 1024) -> CacheBackend:
+    if kind == "memory":
+        return MemoryBackend(max_entries)
+    if kind == "sqlite":
+        return SQLiteBackend(url or os.path.join(".", "cache.db"), max_entries=max_entries)
+    if kind == "redis":
+        return RedisBackend(url or "redis://localhost:6379/0")
+    raise ValueError(f"Неизвестный CACHE_BACKEND: {kind}")
+
+
+# Общий кэш приложения: сводка главной, фасеты, фрагменты и готовые страницы
+cache = create_backend(config.CACHE_BACKEND, config.CACHE_URL, config.CACHE_MAX_ENTRIES)
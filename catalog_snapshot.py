@@ -0,0 +1,138 @@
+# catalog_snapshot.py - снимок таблицы салонов в памяти воркера
+import threading
+from bisect import bisect_left
+from typing import Callable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import config
+import models
+from data_version import SALONS, get_version
+from facets import ascii_lower, count_facets, sql_lower
+from pagination import SALON_SORTS, sort_records
+
+SALON_FIELDS = (
+    "id", "name", "category", "description", "address", "district", "phone",
+    "working_hours", "rating", "reviews_count", "is_verified", "image_url",
+    "created_at",
+)
+
+
+class SalonRecord:
+    """Неизменяемая копия строки salons - те же атрибуты, что у models.Salon"""
+    __slots__ = SALON_FIELDS + ("search_text",)
+
+    def __init__(self, row, fold: Callable[[str], str] = ascii_lower):
+        for field in SALON_FIELDS:
+            object.__setattr__(self, field, getattr(row, field))
+        object.__setattr__(self, "search_text", "\n".join(
+            fold(getattr(row, field) or "")
+            for field in ("name", "description", "address", "district", "category")
+        ))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SalonRecord is read-only")
+
+
+class CatalogSnapshot:
+    __slots__ = (
+        "version", "salons", "by_id", "orders", "facet_groups", "categories", "districts", "fold",
+    )
+
+    def __init__(self, version: int, salons: List[SalonRecord], fold: Callable[[str], str] = ascii_lower):
+        self.version = version
+        self.salons = tuple(salons)
+        self.by_id = {salon.id: salon for salon in self.salons}
+        # Фильтры и поиск сравнивают строки так же, как lower() базы
+        self.fold = fold
+        # Порядки сортировки каталога - те же, что у keyset_order, считаются один раз
+        self.orders = {key: tuple(sort_records(self.salons, keys)) for key, keys in SALON_SORTS.items()}
+
+        # (категория, район) -> число салонов и отсортированные рейтинги для счетчиков
+        # через bisect; салоны без рейтинга, как и в SQL, под фильтр min_rating не попадают
+        groups = {}
+        for salon in self.salons:
+            group = groups.setdefault((salon.category, salon.district), [0, []])
+            group[0] += 1
+            if salon.rating is not None:
+                group[1].append(salon.rating)
+        self.facet_groups = tuple(
+            (category, district, total, tuple(sorted(ratings)))
+            for (category, district), (total, ratings) in sorted(
+                groups.items(), key=lambda item: (item[0][0] or "", item[0][1] or "")
+            )
+        )
+
+        facets = count_facets(((c, d, total) for c, d, total, _ in self.facet_groups), fold=fold)
+        self.categories = tuple(facets["categories"])
+        self.districts = tuple(facets["districts"])
+
+    def filter(
+        self,
+        category: Optional[str] = None,
+        district: Optional[str] = None,
+        min_rating: Optional[float] = None,
+        sort_by: str = "popular",
+    ) -> List[SalonRecord]:
+        fold = self.fold
+        category = fold(category) if category else None
+        district = fold(district) if district else None
+        result = []
+        for salon in self.orders.get(sort_by, self.orders["popular"]):
+            if category and fold(salon.category or "") != category:
+                continue
+            if district and fold(salon.district or "") != district:
+                continue
+            if min_rating is not None and (salon.rating is None or salon.rating < min_rating):
+                continue
+            result.append(salon)
+        return result
+
+    def search(self, query: str) -> List[SalonRecord]:
+        term = self.fold(query)
+        return [salon for salon in self.salons if term in salon.search_text]
+
+    def facets(
+        self,
+        category: Optional[str] = None,
+        district: Optional[str] = None,
+        min_rating: Optional[float] = None,
+    ):
+        rows = []
+        for cat, dist, count, ratings in self.facet_groups:
+            if min_rating is not None:
+                count = len(ratings) - bisect_left(ratings, min_rating)
+            rows.append((cat, dist, count))
+        return count_facets(rows, category, district, self.fold)
+
+
+def load_snapshot(db: Session) -> CatalogSnapshot:
+    # Версию и строки читаем в одной транзакции, чтобы они соответствовали друг другу
+    version = get_version(db, SALONS)
+    columns = [getattr(models.Salon, field) for field in SALON_FIELDS]
+    rows = db.execute(select(*columns).order_by(models.Salon.id)).all()
+    fold = sql_lower(db.get_bind().dialect.name)
+    return CatalogSnapshot(version, [SalonRecord(row, fold) for row in rows], fold)
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_reload_lock = threading.Lock()
+
+
+def get_catalog_snapshot(db: Session) -> Optional[CatalogSnapshot]:
+    """Актуальный снимок каталога или None, если снимок выключен"""
+    global _snapshot
+    if not config.CATALOG_SNAPSHOT:
+        return None
+
+    version = get_version(db, SALONS)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _reload_lock:
+        if _snapshot is None or _snapshot.version != version:
+            # Новый снимок подменяется целиком - читатели видят либо старый, либо новый
+            _snapshot = load_snapshot(db)
+        return _snapshot
@@ -1,6 +1,9 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, desc, func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import desc, func
 import models
+from view_counter import view_counter
+from search_index import apply_blog_search, apply_salon_search
 from typing import List, Optional
 
 # Салоны
@@ -26,14 +29,15 @@ def get_salons(
 def get_salon(db: Session, salon_id: int):
     return db.query(models.Salon).filter(models.Salon.id == salon_id).first()
 
+def get_salon_with_details(db: Session, salon_id: int):
+    # Услуги и отзывы - двумя IN-запросами вместе с салоном
+    return db.query(models.Salon).options(
+        selectinload(models.Salon.services),
+        selectinload(models.Salon.reviews)
+    ).filter(models.Salon.id == salon_id).first()
+
 def search_salons(db: Session, query: str, limit: int = 20):
-    return db.query(models.Salon).filter(
-        or_(
-            models.Salon.name.ilike(f"%{query}%"),
-            models.Salon.description.ilike(f"%{query}%"),
-            models.Salon.address.ilike(f"%{query}%")
-        )
-    ).limit(limit).all()
+    return apply_salon_search(db.query(models.Salon), query).limit(limit).all()
 
 # Услуги
 def get_services_by_salon(db: Session, salon_id: int):
@@ -67,10 +71,8 @@ def get_districts(db: Session):
     return [dist[0] for dist in result if dist[0]]
 
 # Блог посты
-def get_blog_posts(
+def blog_posts_query(
     db: Session,
-    skip: int = 0,
-    limit: int = 10,
     category: Optional[str] = None,
     tag: Optional[str] = None,
     search: Optional[str] = None,
@@ -88,36 +90,63 @@ def get_blog_posts(
         query = query.join(models.BlogPost.tags).filter(models.BlogTag.name == tag)
     
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            models.BlogPost.title.ilike(search_term) |
-            models.BlogPost.content.ilike(search_term) |
-            models.BlogPost.excerpt.ilike(search_term)
-        )
+        # Полнотекстовый индекс, при поиске сортировка по релевантности
+        query = apply_blog_search(query, search)
     
+    return query
+
+def get_blog_posts(
+    db: Session,
+    skip: int = 0,
+    limit: int = 10,
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    search: Optional[str] = None,
+    only_published: bool = True
+):
+    query = blog_posts_query(db, category, tag, search, only_published)
     return query.order_by(desc(models.BlogPost.created_at)).offset(skip).limit(limit).all()
 
 def get_blog_post(db: Session, post_id: int):
     return db.query(models.BlogPost).filter(models.BlogPost.id == post_id).first()
 
 def get_blog_post_by_slug(db: Session, slug: str):
-    return db.query(models.BlogPost).filter(models.BlogPost.slug == slug).first()
+    return db.query(models.BlogPost).options(
+        selectinload(models.BlogPost.tags)
+    ).filter(models.BlogPost.slug == slug).first()
 
 def increment_post_views(db: Session, post_id: int):
-    post = get_blog_post(db, post_id)
+    # Просмотр копится в буфере воркера, в БД попадает пачкой
+    post = db.get(models.BlogPost, post_id)
     if post:
-        post.views_count += 1
-        db.commit()
-        db.refresh(post)
+        view_counter.hit(post.id)
+        set_committed_value(post, "views_count", (post.views_count or 0) + 1)
     return post
 
 def get_popular_posts(db: Session, limit: int = 5):
-    return db.query(models.BlogPost).filter(
+    posts = db.query(models.BlogPost).filter(
         models.BlogPost.is_published == True
     ).order_by(
         desc(models.BlogPost.views_count)
     ).limit(limit).all()
 
+    # Статьи с еще не записанными просмотрами могут обогнать топ из БД
+    pending_ids = list(view_counter.pending())
+    if pending_ids:
+        candidates = {post.id: post for post in posts}
+        for post in db.query(models.BlogPost).filter(
+            models.BlogPost.is_published == True,
+            models.BlogPost.id.in_(pending_ids)
+        ).all():
+            candidates[post.id] = post
+        posts = sorted(
+            candidates.values(),
+            key=lambda post: post.views_count or 0,
+            reverse=True
+        )[:limit]
+
+    return posts
+
 def get_recent_posts(db: Session, limit: int = 5):
     return db.query(models.BlogPost).filter(
         models.BlogPost.is_published == True
@@ -170,6 +199,8 @@ def get_post_comments(db: Session, post_id: int, only_approved: bool = True):
     
     return query.order_by(desc(models.BlogComment.created_at)).all()
 
+# Запись: функции только добавляют и flush-ат, commit делает вызывающий -
+# обычно очередь писателя (writer.py), которая фиксирует пачку задач разом
 def create_comment(db: Session, post_id: int, author_name: str, content: str, author_email: Optional[str] = None):
     comment = models.BlogComment(
         post_id=post_id,
@@ -178,8 +209,7 @@ def create_comment(db: Session, post_id: int, author_name: str, content: str, au
         content=content
     )
     db.add(comment)
-    db.commit()
-    db.refresh(comment)
+    db.flush()
     return comment
 
 def create_blog_category(db: Session, name: str, description: Optional[str] = None):
@@ -190,8 +220,7 @@ def create_blog_category(db: Session, name: str, description: Optional[str] = No
         description=description
     )
     db.add(category)
-    db.commit()
-    db.refresh(category)
+    db.flush()
     return category
 
 def create_blog_tag(db: Session, name: str):
@@ -201,8 +230,7 @@ def create_blog_tag(db: Session, name: str):
         slug=slugify(name)
     )
     db.add(tag)
-    db.commit()
-    db.refresh(tag)
+    db.flush()
     return tag
 
 def create_blog_post(
@@ -239,6 +267,5 @@ def create_blog_post(
                 tag = create_blog_tag(db, tag_name)
             post.tags.append(tag)
     
-    db.commit()
-    db.refresh(post)
+    db.flush()
     return post
\ No newline at end of file
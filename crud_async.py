@@ -0,0 +1,283 @@
+# crud_async.py - асинхронные версии функций crud.py для AsyncSession
+from sqlalchemy import desc, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+import crud
+import models
+from view_counter import view_counter
+from writer import write_queue
+from search_index import apply_blog_search, apply_salon_search
+from typing import List, Optional
+
+# Салоны
+async def get_salons(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    category: Optional[str] = None,
+    district: Optional[str] = None,
+    min_rating: Optional[float] = None
+):
+    query = select(models.Salon)
+
+    if category:
+        query = query.where(models.Salon.category == category)
+    if district:
+        query = query.where(models.Salon.district == district)
+    if min_rating:
+        query = query.where(models.Salon.rating >= min_rating)
+
+    query = query.order_by(models.Salon.rating.desc()).offset(skip).limit(limit)
+    return (await db.scalars(query)).all()
+
+async def get_salon(db: AsyncSession, salon_id: int):
+    return await db.get(models.Salon, salon_id)
+
+async def get_salon_with_details(db: AsyncSession, salon_id: int):
+    # Услуги и отзывы - двумя IN-запросами вместе с салоном
+    return (await db.scalars(
+        select(models.Salon)
+        .options(
+            selectinload(models.Salon.services),
+            selectinload(models.Salon.reviews)
+        )
+        .where(models.Salon.id == salon_id)
+    )).first()
+
+async def search_salons(db: AsyncSession, query: str, limit: int = 20):
+    statement = apply_salon_search(select(models.Salon), query).limit(limit)
+    return (await db.scalars(statement)).all()
+
+# Услуги
+async def get_services_by_salon(db: AsyncSession, salon_id: int):
+    return (await db.scalars(
+        select(models.Service).where(models.Service.salon_id == salon_id)
+    )).all()
+
+async def get_services_by_category(db: AsyncSession, salon_id: int, category: str):
+    return (await db.scalars(
+        select(models.Service).where(
+            models.Service.salon_id == salon_id,
+            models.Service.category == category
+        )
+    )).all()
+
+# Отзывы
+async def get_reviews_by_salon(db: AsyncSession, salon_id: int, limit: Optional[int] = 10):
+    query = select(models.Review).where(
+        models.Review.salon_id == salon_id
+    ).order_by(models.Review.created_at.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return (await db.scalars(query)).all()
+
+# Статистика
+async def get_categories(db: AsyncSession):
+    result = await db.scalars(select(models.Salon.category).distinct())
+    return [cat for cat in result if cat]
+
+async def get_districts(db: AsyncSession):
+    result = await db.scalars(select(models.Salon.district).distinct())
+    return [dist for dist in result if dist]
+
+# Блог посты
+async def get_blog_posts(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 10,
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    search: Optional[str] = None,
+    only_published: bool = True
+):
+    query = select(models.BlogPost)
+
+    if only_published:
+        query = query.where(models.BlogPost.is_published == True)
+
+    if category:
+        query = query.where(models.BlogPost.category == category)
+
+    if tag:
+        query = query.join(models.BlogPost.tags).where(models.BlogTag.name == tag)
+
+    if search:
+        query = apply_blog_search(query, search)
+
+    query = query.order_by(desc(models.BlogPost.created_at)).offset(skip).limit(limit)
+    return (await db.scalars(query)).all()
+
+async def get_blog_post(db: AsyncSession, post_id: int):
+    return await db.get(models.BlogPost, post_id)
+
+async def get_blog_post_by_slug(db: AsyncSession, slug: str):
+    # Теги нужны шаблону статьи - ленивой загрузки в async нет
+    return (await db.scalars(
+        select(models.BlogPost)
+        .options(selectinload(models.BlogPost.tags))
+        .where(models.BlogPost.slug == slug)
+    )).first()
+
+async def get_similar_posts(db: AsyncSession, post_id: int, limit: int = 4, category: Optional[str] = None):
+    posts = (await db.scalars(
+        select(models.BlogPost)
+        .join(models.SimilarPost, models.SimilarPost.similar_id == models.BlogPost.id)
+        .where(
+            models.SimilarPost.post_id == post_id,
+            models.BlogPost.is_published == True
+        )
+        .order_by(models.SimilarPost.rank)
+        .limit(limit)
+    )).all()
+
+    # Индекс еще не построен или в топе мало статей - добираем статьями той же
+    # категории и с общими тегами, затем последними
+    if len(posts) < limit:
+        posts = list(posts)
+        exclude = [post_id] + [post.id for post in posts]
+        post_tags = models.post_tags
+        same_tags = select(post_tags.c.post_id).where(
+            post_tags.c.tag_id.in_(select(post_tags.c.tag_id).where(post_tags.c.post_id == post_id))
+        )
+        related = models.BlogPost.id.in_(same_tags)
+        if category:
+            related = (models.BlogPost.category == category) | related
+        posts += (await db.scalars(
+            select(models.BlogPost)
+            .where(models.BlogPost.is_published == True, models.BlogPost.id.not_in(exclude), related)
+            .order_by(desc(models.BlogPost.category == category), desc(models.BlogPost.created_at))
+            .limit(limit - len(posts))
+        )).all()
+
+    if len(posts) < limit:
+        exclude = [post_id] + [post.id for post in posts]
+        posts += (await db.scalars(
+            select(models.BlogPost)
+            .where(models.BlogPost.is_published == True, models.BlogPost.id.not_in(exclude))
+            .order_by(desc(models.BlogPost.created_at))
+            .limit(limit - len(posts))
+        )).all()
+    return posts
+
+async def increment_post_views(db: AsyncSession, post_id: int):
+    post = await db.get(models.BlogPost, post_id)
+    if post:
+        view_counter.hit(post.id)
+        set_committed_value(post, "views_count", (post.views_count or 0) + 1)
+    return post
+
+async def get_popular_posts(db: AsyncSession, limit: int = 5):
+    posts = (await db.scalars(
+        select(models.BlogPost).where(
+            models.BlogPost.is_published == True
+        ).order_by(
+            desc(models.BlogPost.views_count)
+        ).limit(limit)
+    )).all()
+
+    pending_ids = list(view_counter.pending())
+    if pending_ids:
+        candidates = {post.id: post for post in posts}
+        for post in await db.scalars(
+            select(models.BlogPost).where(
+                models.BlogPost.is_published == True,
+                models.BlogPost.id.in_(pending_ids)
+            )
+        ):
+            candidates[post.id] = post
+        posts = sorted(
+            candidates.values(),
+            key=lambda post: post.views_count or 0,
+            reverse=True
+        )[:limit]
+
+    return posts
+
+async def get_recent_posts(db: AsyncSession, limit: int = 5):
+    return (await db.scalars(
+        select(models.BlogPost).where(
+            models.BlogPost.is_published == True
+        ).order_by(
+            desc(models.BlogPost.created_at)
+        ).limit(limit)
+    )).all()
+
+# Категории блога
+async def get_blog_categories(db: AsyncSession):
+    return (await db.scalars(select(models.BlogCategory))).all()
+
+async def get_blog_categories_with_counts(db: AsyncSession):
+    result = await db.execute(
+        select(
+            models.BlogPost.category,
+            func.count(models.BlogPost.id).label('count')
+        ).where(
+            models.BlogPost.is_published == True
+        ).group_by(
+            models.BlogPost.category
+        )
+    )
+
+    return [{"name": cat[0], "count": cat[1]} for cat in result if cat[0]]
+
+# Теги блога
+async def get_blog_tags(db: AsyncSession):
+    return (await db.scalars(select(models.BlogTag))).all()
+
+async def get_popular_tags(db: AsyncSession, limit: int = 10):
+    result = await db.execute(
+        select(
+            models.BlogTag,
+            func.count(models.post_tags.c.post_id).label('count')
+        ).join(
+            models.post_tags
+        ).group_by(
+            models.BlogTag.id
+        ).order_by(
+            desc('count')
+        ).limit(limit)
+    )
+
+    return result.all()
+
+# Комментарии
+async def get_post_comments(db: AsyncSession, post_id: int, only_approved: bool = True):
+    query = select(models.BlogComment).where(
+        models.BlogComment.post_id == post_id
+    )
+
+    if only_approved:
+        query = query.where(models.BlogComment.is_approved == True)
+
+    return (await db.scalars(query.order_by(desc(models.BlogComment.created_at)))).all()
+
+# Запись - через очередь писателя: асинхронные сессии работают только на чтение,
+# db оставлен в сигнатурах для совместимости
+async def create_comment(db: AsyncSession, post_id: int, author_name: str, content: str, author_email: Optional[str] = None):
+    return await write_queue.run(
+        lambda session: crud.create_comment(session, post_id, author_name, content, author_email)
+    )
+
+async def create_blog_category(db: AsyncSession, name: str, description: Optional[str] = None):
+    return await write_queue.run(lambda session: crud.create_blog_category(session, name, description))
+
+async def create_blog_tag(db: AsyncSession, name: str):
+    return await write_queue.run(lambda session: crud.create_blog_tag(session, name))
+
+async def create_blog_post(
+    db: AsyncSession,
+    title: str,
+    content: str,
+    category: str,
+    excerpt: Optional[str] = None,
+    author: str = "Администратор",
+    image_url: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    is_published: bool = True
+):
+    return await write_queue.run(
+        lambda session: crud.create_blog_post(
+            session, title, content, category, excerpt, author, image_url, tags, is_published
+        )
+    )
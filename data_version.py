@@ -0,0 +1,67 @@
+# data_version.py - счетчики версий данных для инвалидации кэшей во всех воркерах
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+import models
+
+SALONS = "salons"
+BLOG = "blog"
+
+# Какие модели относятся к какой области данных
+SCOPES = {
+    models.Salon: SALONS,
+    models.Service: SALONS,
+    models.Review: SALONS,
+    models.BlogPost: BLOG,
+    models.BlogCategory: BLOG,
+    models.BlogTag: BLOG,
+    models.BlogComment: BLOG,
+}
+
+
+def get_version(db: Session, name: str) -> int:
+    version = db.execute(
+        select(models.DataVersion.version).where(models.DataVersion.name == name)
+    ).scalar()
+    return version or 0
+
+
+def get_versions(db: Session, *names: str) -> tuple:
+    """Версии нескольких областей одним запросом"""
+    rows = db.execute(
+        select(models.DataVersion.name, models.DataVersion.version).where(
+            models.DataVersion.name.in_(names)
+        )
+    ).all()
+    versions = dict(rows)
+    return tuple(versions.get(name, 0) for name in names)
+
+
+def bump_version(db: Session, *names: str):
+    """Увеличивает версию в текущей транзакции (видна после commit)"""
+    table = models.DataVersion.__table__
+    # Core-запросы через соединение сессии - без autoflush и ORM-синхронизации
+    connection = db.connection()
+    for name in names:
+        result = connection.execute(
+            update(table)
+            .where(table.c.name == name)
+            .values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=1))
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_on_flush(session, flush_context, instances):
+    scopes = set()
+    for obj in list(session.new) + list(session.deleted):
+        scope = SCOPES.get(type(obj))
+        if scope:
+            scopes.add(scope)
+    for obj in session.dirty:
+        scope = SCOPES.get(type(obj))
+        if scope and session.is_modified(obj):
+            scopes.add(scope)
+
+    if scopes:
+        bump_version(session, *sorted(scopes))
@@ -1,24 +1,165 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, raiseload, sessionmaker
 import os
+import config
 
-# SQLite база данных (файл в текущей папке)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./site.db"
+# Асинхронные драйверы для синхронного адреса базы
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Только для SQLite
-)
+
+def async_database_url(url: str) -> str:
+    """Тот же адрес базы с асинхронным драйвером"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"Нет асинхронного драйвера для {parsed.get_backend_name()}, задайте ASYNC_DATABASE_URL")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# База данных из настроек (по умолчанию файл SQLite в текущей папке)
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+# Та же база через асинхронный драйвер - для асинхронных обработчиков
+ASYNC_DATABASE_URL = config.ASYNC_DATABASE_URL or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+
+def engine_options(url: str, read_only: bool = False) -> dict:
+    """Параметры пула и драйвера для движков приложения"""
+    parsed = make_url(url)
+    # Размер очереди и таймаут есть только у QueuePool; база SQLite в памяти
+    # (SingletonThreadPool, StaticPool) их не принимает
+    options = {"pool_recycle": config.DB_POOL_RECYCLE}
+    if issubclass(parsed.get_dialect().get_pool_class(parsed), QueuePool):
+        options.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+        )
+    if parsed.get_backend_name() == "sqlite":
+        # Соединения пула переходят между потоками
+        options["connect_args"] = {"check_same_thread": False}
+    elif read_only:
+        # SET TRANSACTION READ ONLY у каждой транзакции (psycopg2 и asyncpg);
+        # у SQLite то же делает PRAGMA query_only
+        options["execution_options"] = {"postgresql_readonly": True}
+    return options
+
+
+# Движок записи: миграции, скрипты и поток-писатель приложения (writer.py)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+
+# Движок чтения: пул соединений только для чтения для обработчиков запросов
+read_engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL, read_only=True))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+# Сессии писателя: результаты задач передаются в другие потоки уже после commit;
+# только их транзакции начинаются с BEGIN IMMEDIATE (см. _begin)
+WriteSessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, bind=engine.execution_options(sqlite_immediate=True),
+    expire_on_commit=False,
+)
+
+# Асинхронные обработчики только читают - запись идет через очередь писателя
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, read_only=True))
+
+# expire_on_commit=False - объекты остаются доступными шаблонам после commit
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
-# Зависимость для получения сессии БД
+
+def sqlite_pragmas() -> list:
+    """PRAGMA профиля соединения из настроек; пустые значения пропускаются"""
+    settings = (
+        ("busy_timeout", config.SQLITE_BUSY_TIMEOUT_MS),
+        ("journal_mode", config.SQLITE_JOURNAL_MODE),
+        ("synchronous", config.SQLITE_SYNCHRONOUS),
+        ("mmap_size", config.SQLITE_MMAP_SIZE),
+        ("cache_size", config.SQLITE_CACHE_SIZE),
+        ("temp_store", config.SQLITE_TEMP_STORE),
+    )
+    return [f"PRAGMA {name}={value}" for name, value in settings if value not in (None, "")]
+
+
+def apply_sqlite_profile(dbapi_connection, connection_record=None):
+    # busy_timeout первым: переключение в WAL само может ждать блокировку
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def _read_only(dbapi_connection, connection_record=None):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def _autocommit_driver(dbapi_connection, connection_record=None):
+    # Транзакциями управляет SQLAlchemy, а не pysqlite: иначе SAVEPOINT
+    # (групповой commit писателя) начинает и завершает транзакцию сам
+    dbapi_connection.isolation_level = None
+
+
+def _begin(connection):
+    # Писатель берет блокировку записи сразу - без взаимоблокировки при повышении
+    # с чтения; остальные сессии движка (скрипты, SessionLocal) - обычный BEGIN и
+    # не держат блокировку, пока только читают
+    if connection.get_execution_options().get("sqlite_immediate"):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        connection.exec_driver_sql("BEGIN")
+
+
+# Все движки работают с одним файлом - профиль у всех
+for _engine in (engine, read_engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", apply_sqlite_profile)
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _autocommit_driver)
+    event.listen(engine, "begin", _begin)
+for _engine in (read_engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _read_only)
+
+
+# Связи, не указанные в selectinload/joinedload запроса, не грузятся молча,
+# а падают с ошибкой - так видно N+1 в шаблонах
+@event.listens_for(Session, "do_orm_execute")
+def _raise_on_lazy_load(execute_state):
+    if (
+        config.RAISE_ON_LAZY_LOAD
+        and execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+    ):
+        execute_state.statement = execute_state.statement.options(raiseload("*"))
+
+
+# Зависимость для получения сессии БД (только чтение; запись - writer.write_queue)
 def get_db():
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Асинхронная сессия - запросы не блокируют event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
@@ -0,0 +1,126 @@
+# facets.py - подсчет фасетов каталога (категории и районы) за один запрос
+import string
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+import models
+from cache_backend import cache
+from data_version import SALONS, get_version
+from typing import Callable, Iterable, Optional, Tuple
+
+FACET_KEYS = (
+    "categories",
+    "districts",
+    "category_counts",
+    "district_counts",
+    "all_categories_count",
+    "all_districts_count",
+)
+
+# Запись с устаревшей версией в ключе просто доживает до TTL
+FACETS_TTL = 300.0
+
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def ascii_lower(value: str) -> str:
+    """lower() SQLite: к нижнему регистру приводится только латиница"""
+    return value.translate(_ASCII_LOWER)
+
+
+def sql_lower(dialect_name: str) -> Callable[[str], str]:
+    """Приведение регистра как у lower() базы: фильтр каталога сравнивает
+    lower(category) = lower(:category); lower()/ILIKE в PostgreSQL учитывают и кириллицу"""
+    return str.lower if dialect_name == "postgresql" else ascii_lower
+
+
+def count_facets(
+    rows: Iterable[Tuple[Optional[str], Optional[str], int]],
+    category: Optional[str] = None,
+    district: Optional[str] = None,
+    fold: Callable[[str], str] = ascii_lower,
+):
+    """Считает фасеты по строкам (категория, район, количество) за один проход"""
+
+    def _norm(value: Optional[str]) -> str:
+        return fold(value or "")
+
+    selected_category = _norm(category) if category else None
+    selected_district = _norm(district) if district else None
+
+    categories = {}
+    districts = {}
+    category_totals = {}
+    district_totals = {}
+    all_categories_count = 0
+    all_districts_count = 0
+
+    for cat, dist, count in rows:
+        cat_key = _norm(cat)
+        dist_key = _norm(dist)
+        in_category = selected_category is None or cat_key == selected_category
+        in_district = selected_district is None or dist_key == selected_district
+
+        if cat:
+            categories[cat] = None
+        if dist:
+            districts[dist] = None
+
+        # Категории считаем с учетом всех фильтров, кроме самой категории
+        if in_district:
+            category_totals[cat_key] = category_totals.get(cat_key, 0) + count
+            all_categories_count += count
+
+        # Районы - с учетом всех фильтров, кроме самого района
+        if in_category:
+            district_totals[dist_key] = district_totals.get(dist_key, 0) + count
+            all_districts_count += count
+
+    return {
+        "categories": list(categories),
+        "districts": list(districts),
+        "category_counts": {cat: category_totals.get(_norm(cat), 0) for cat in categories},
+        "district_counts": {dist: district_totals.get(_norm(dist), 0) for dist in districts},
+        "all_categories_count": all_categories_count,
+        "all_districts_count": all_districts_count,
+    }
+
+
+def get_salon_facets(
+    db: Session,
+    category: Optional[str] = None,
+    district: Optional[str] = None,
+    min_rating: Optional[float] = None,
+):
+    """Фасеты каталога одним GROUP BY по (категория, район)"""
+    # Условие не сужает выборку, а только учитывается в счетчике -
+    # так в списках фильтров остаются все категории и районы
+    if min_rating is not None:
+        counter = func.count(case((models.Salon.rating >= min_rating, 1)))
+    else:
+        counter = func.count(models.Salon.id)
+
+    rows = db.query(
+        models.Salon.category,
+        models.Salon.district,
+        counter,
+    ).group_by(models.Salon.category, models.Salon.district).all()
+
+    return count_facets(rows, category, district, sql_lower(db.get_bind().dialect.name))
+
+
+def get_cached_salon_facets(
+    db: Session,
+    category: Optional[str] = None,
+    district: Optional[str] = None,
+    min_rating: Optional[float] = None,
+):
+    """То же через общий кэш; ключ включает версию данных салонов"""
+    fold = sql_lower(db.get_bind().dialect.name)
+    key = f"facets:{get_version(db, SALONS)}:{fold(category or '')}:{fold(district or '')}:{min_rating}"
+    return cache.get_or_set(
+        key,
+        lambda: get_salon_facets(db, category=category, district=district, min_rating=min_rating),
+        FACETS_TTL,
+    )
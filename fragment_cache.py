@@ -0,0 +1,96 @@
+# fragment_cache.py - кэширование фрагментов шаблонов: {% cache key, ttl %} ... {% endcache %}
+#
+# key - строка или список (например ["blog-sidebar", blog_version, current_tag]),
+# ttl - время жизни в секундах. Данные для фрагмента передаются в шаблон через
+# Lazy: если фрагмент уже в кэше, ни запроса к БД, ни рендеринга не будет.
+from typing import Callable, Dict, Iterable
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+import metrics
+from cache_backend import CacheBackend
+
+_NOT_LOADED = object()
+
+
+class Lazy:
+    """Значение для шаблона, которое вычисляется при первом обращении"""
+    __slots__ = ("_loader", "_value")
+
+    def __init__(self, loader: Callable):
+        self._loader = loader
+        self._value = _NOT_LOADED
+
+    @property
+    def value(self):
+        if self._value is _NOT_LOADED:
+            self._value = self._loader()
+        return self._value
+
+    def __iter__(self):
+        return iter(self.value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __bool__(self):
+        return bool(self.value)
+
+    def __contains__(self, item):
+        return item in self.value
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __getattr__(self, name):
+        return getattr(self.value, name)
+
+    def __str__(self):
+        return str(self.value)
+
+
+def lazy_mapping(loader: Callable[[], dict], keys: Iterable[str]) -> Dict[str, Lazy]:
+    """Несколько переменных шаблона из одного отложенного вызова loader()"""
+    shared = Lazy(loader)
+    return {key: Lazy(lambda key=key: shared.value[key]) for key in keys}
+
+
+def _key_string(key) -> str:
+    if isinstance(key, (list, tuple)):
+        return ":".join("" if part is None else str(part) for part in key)
+    return str(key)
+
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_prefix="fragment:")
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = parser.parse_expression()
+        ttl = nodes.Const(None)
+        if parser.stream.skip_if("comma"):
+            ttl = parser.parse_expression()
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_cache_support", [key, ttl]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, key, ttl, caller):
+        backend: CacheBackend = self.environment.fragment_cache
+        if backend is None or ttl == 0:
+            return caller()
+
+        full_key = self.environment.fragment_cache_prefix + _key_string(key)
+        fragment = backend.safe_get(full_key)
+        metrics.cache_lookup("fragment", fragment is not None)
+        if fragment is None:
+            fragment = str(caller())
+            backend.safe_set(full_key, fragment, ttl)
+        # Фрагмент отрендерен этим же окружением - экранирование уже выполнено
+        return Markup(fragment)
@@ -0,0 +1,14 @@
+# gunicorn.conf.py - настройки gunicorn (Procfile: gunicorn -k uvicorn.workers.UvicornWorker main:app)
+
+
+def on_starting(server):
+    # Миграции, ANALYZE и перестройка полнотекстового индекса - один раз в
+    # мастер-процессе; воркеры, импортируя main, их не выполняют
+    from database import engine
+    from migrations import prepare_database
+
+    applied = prepare_database(engine)
+    for name in applied:
+        server.log.info("Применена миграция: %s", name)
+    # Соединения мастера не должны достаться воркерам после fork
+    engine.dispose()
@@ -0,0 +1,115 @@
+# home_stats.py - материализованная сводка для главной страницы
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+import config
+import models
+from cache_backend import cache
+from data_version import BLOG, SALONS, get_versions
+
+
+def _salon_dict(salon: models.Salon) -> dict:
+    return {
+        "id": salon.id,
+        "name": salon.name,
+        "category": salon.category,
+        "address": salon.address,
+        "phone": salon.phone,
+        "working_hours": salon.working_hours,
+        "rating": salon.rating,
+        "reviews_count": salon.reviews_count,
+        "is_verified": salon.is_verified,
+        "image_url": salon.image_url,
+    }
+
+
+def _counts(rows) -> list:
+    return [{"name": name, "count": count} for name, count in rows if name]
+
+
+def build_home_summary(db: Session) -> dict:
+    """Все агрегаты главной страницы - считается только при обновлении сводки"""
+    total_salons = db.query(models.Salon).count()
+    total_reviews = db.query(models.Review).count()
+    total_categories = db.query(models.Salon.category).distinct().count()
+    avg_rating = db.query(func.avg(models.Salon.rating)).scalar() or 0
+
+    top_salons = db.query(models.Salon).order_by(
+        models.Salon.rating.desc(),
+        models.Salon.reviews_count.desc()
+    ).limit(3).all()
+
+    categories = db.query(
+        models.Salon.category,
+        func.count(models.Salon.id).label('count')
+    ).group_by(models.Salon.category).all()
+
+    districts = db.query(
+        models.Salon.district,
+        func.count(models.Salon.id).label('count')
+    ).group_by(models.Salon.district).all()
+    districts_data = _counts(districts)
+
+    # Отзывы вместе с названием салона - одним запросом
+    recent_reviews = db.query(models.Review, models.Salon.name).join(
+        models.Salon
+    ).order_by(
+        models.Review.created_at.desc()
+    ).limit(4).all()
+
+    blog_posts = db.query(models.BlogPost).options(
+        selectinload(models.BlogPost.tags)
+    ).filter(
+        models.BlogPost.is_published == True
+    ).order_by(
+        models.BlogPost.views_count.desc()
+    ).limit(3).all()
+
+    return {
+        "stats": {
+            "total_salons": total_salons,
+            "total_reviews": total_reviews,
+            "average_rating": round(avg_rating, 1),
+            "total_categories": total_categories,
+        },
+        "top_salons": [_salon_dict(salon) for salon in top_salons],
+        "categories": _counts(categories),
+        "recent_reviews": [
+            {
+                "author_name": review.author_name,
+                "created_at": review.created_at,
+                "rating": review.rating,
+                "text": review.text,
+                "tags": review.tags,
+                "salon": {"id": review.salon_id, "name": salon_name},
+            }
+            for review, salon_name in recent_reviews
+        ],
+        "blog_posts": [
+            {
+                "slug": post.slug,
+                "title": post.title,
+                "image_url": post.image_url,
+                "category": post.category,
+                "excerpt": post.excerpt or "",
+                "created_at": post.created_at,
+                "views_count": post.views_count,
+                "tags": [{"name": tag.name, "slug": tag.slug} for tag in post.tags],
+            }
+            for post in blog_posts
+        ],
+        "districts": districts_data,
+        # Максимальное количество салонов в районе (для прогресс-бара)
+        "max_district_count": max([d["count"] for d in districts_data]) if districts_data else 1,
+    }
+
+
+def get_home_summary(db: Session) -> dict:
+    """Сводка из общего кэша; пересчитывается после записи в БД или по истечении TTL"""
+    salons_version, blog_version = get_versions(db, SALONS, BLOG)
+    return cache.get_or_set(
+        f"home:{salons_version}:{blog_version}",
+        # Версия нужна шаблону для ключа кэша фрагментов
+        lambda: {**build_home_summary(db), "salons_version": salons_version},
+        config.HOME_STATS_TTL,
+    )
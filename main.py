@@ -1,111 +1,187 @@
 from fastapi import FastAPI, Request, Form, Depends, Query, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from sqlalchemy import or_, func
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import crud, models
-from database import engine, get_db
+import config, crud_async, models
+from database import ReadSessionLocal, async_engine, engine, get_async_db, get_db, read_engine
+from facets import FACET_KEYS, get_cached_salon_facets
+from catalog_snapshot import get_catalog_snapshot
+from home_stats import get_home_summary
+from view_counter import view_counter
+from autocomplete import get_autocomplete_index
+from migrations import prepare_database
+from search_index import apply_salon_search, detect_search_index, search_salon_ids
+from data_version import BLOG, SALONS, get_version
+from response_cache import ON_HIT_STATE, ResponseCacheMiddleware, register_hit_handler
+from cache_backend import cache
+from fragment_cache import FragmentCacheExtension, lazy_mapping
+from template_warmup import configure_bytecode_cache, format_report, precompile_templates
+from pagination import InvalidCursor, count_cache, keyset_order, keyset_page, salon_sort, snapshot_page
+from blog_listing import SIDEBAR_KEYS, get_blog_page, get_blog_sidebar
+from post_navigation import get_timeline
+from writer import write_queue
+from sql_profiler import ProfiledTemplate, SQLProfilerMiddleware, history, instrument_engine
+import metrics
 import os
 import uvicorn
-from typing import Optional, List
+from typing import Optional
 import math
+import asyncio
+import logging
 from datetime import datetime
 
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# Миграции и перестройка индексов выполняются один раз до запуска воркеров:
+# python migrations.py, а под gunicorn - хук on_starting (gunicorn.conf.py)
 
 app = FastAPI(title="BeautyCity")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
+if config.METRICS:
+    templates.env.template_class = metrics.MeteredTemplate
+elif config.SQL_PROFILING:
+    templates.env.template_class = ProfiledTemplate
+templates.env.add_extension(FragmentCacheExtension)
+templates.env.fragment_cache = cache
+if config.TEMPLATE_CACHE_DIR:
+    configure_bytecode_cache(templates.env, os.path.join(BASE_DIR, config.TEMPLATE_CACHE_DIR))
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+# Готовые страницы для анонимных посетителей; сбрасываются по версиям данных
+if config.RESPONSE_CACHE:
+    app.add_middleware(ResponseCacheMiddleware, cache=cache)
+register_hit_handler("blog_view", view_counter.hit)
+
+# Время SQL-выражений: журнал медленных всегда, профиль запроса - при SQL_PROFILING
+for _engine in (engine, read_engine, async_engine.sync_engine):
+    instrument_engine(_engine, config.SLOW_QUERY_MS)
+if config.SQL_PROFILING:
+    # Снаружи кэша ответов: в профиль попадают и его запросы версий
+    app.add_middleware(SQLProfilerMiddleware)
+
+    @app.get("/debug/sql")
+    async def debug_sql(limit: int = Query(50, ge=1, le=200)):
+        return JSONResponse(content=history.snapshot(limit))
+
+if config.METRICS:
+    # Самый внешний слой: полное время запроса, включая выдачу из кэша страниц
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_pool(engine, "write")
+    metrics.instrument_pool(read_engine, "read")
+    metrics.instrument_pool(async_engine.sync_engine, "async")
+
+    @app.get("/metrics")
+    async def metrics_endpoint(request: Request):
+        if not metrics.scrape_allowed(request):
+            return PlainTextResponse("Доступ запрещен", status_code=403)
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor(request: Request, exc: InvalidCursor):
+    # Испорченная или чужая ссылка "дальше" - ошибка, а не молча первая страница
+    return PlainTextResponse("Некорректная ссылка на страницу списка", status_code=400)
+
+
+async def _flush_views_periodically():
+    while True:
+        await asyncio.sleep(view_counter.flush_interval)
+        try:
+            await asyncio.to_thread(view_counter.flush)
+        except Exception:
+            logger.exception("Не удалось записать просмотры статей")
+
+
+async def _flush_metrics_periodically():
+    while True:
+        await asyncio.sleep(config.METRICS_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(metrics.flush)
+        except Exception:
+            logger.exception("Не удалось записать метрики воркера")
+
+
+@app.on_event("startup")
+def warm_templates():
+    # Все шаблоны компилируются до первого запроса, а не на горячем пути
+    timings = precompile_templates(templates.env)
+    logger.info("Шаблоны загружены:\n%s", format_report(timings))
+
+
+@app.on_event("startup")
+def detect_search_backend():
+    # Только проверка готовых индексов: FTS5, tsvector или ILIKE
+    detect_search_index(read_engine)
+
+
+@app.on_event("startup")
+def start_writer():
+    # Все записи приложения - через один поток-писатель с групповым commit
+    write_queue.start()
+
+
+@app.on_event("startup")
+async def start_view_counter():
+    app.state.view_flusher = asyncio.create_task(_flush_views_periodically())
+
+
+@app.on_event("startup")
+def build_autocomplete_index():
+    db = ReadSessionLocal()
+    try:
+        get_autocomplete_index(db)
+    finally:
+        db.close()
 
+
+@app.on_event("startup")
+async def start_metrics_flusher():
+    # Нужен только в мультипроцессном режиме - общий каталог воркеров
+    if config.METRICS and config.METRICS_DIR:
+        os.makedirs(config.METRICS_DIR, exist_ok=True)
+        metrics.clear_stale()
+        app.state.metrics_flusher = asyncio.create_task(_flush_metrics_periodically())
+
+
+@app.on_event("shutdown")
+def stop_metrics_flusher():
+    flusher = getattr(app.state, "metrics_flusher", None)
+    if flusher is not None:
+        flusher.cancel()
+        metrics.remove_own()
+
+
+@app.on_event("shutdown")
+async def flush_view_counter():
+    app.state.view_flusher.cancel()
+    view_counter.flush()
+    # Дописываем очередь (в том числе только что сброшенные просмотры)
+    await asyncio.to_thread(write_queue.stop)
+    await async_engine.dispose()
+
+
+# Обработчики с синхронной сессией (get_db) объявлены через def: FastAPI выполняет
+# их в пуле потоков, и запросы к базе не блокируют цикл событий
 @app.get("/", response_class=HTMLResponse)
-async def home(request: Request, db: Session = Depends(get_db)):
-    # Статистика
-    total_salons = db.query(models.Salon).count()
-    total_reviews = db.query(models.Review).count()
-    total_categories = db.query(models.Salon.category).distinct().count()
-    
-    # Средний рейтинг
-    avg_rating = db.query(func.avg(models.Salon.rating)).scalar() or 0
-    average_rating = round(avg_rating, 1)
-    
-    # Топ салоны по рейтингу (3 лучших)
-    top_salons = db.query(models.Salon).order_by(
-        models.Salon.rating.desc(),
-        models.Salon.reviews_count.desc()
-    ).limit(3).all()
-    
-    # Категории с количеством салонов
-    categories = db.query(
-        models.Salon.category,
-        func.count(models.Salon.id).label('count')
-    ).group_by(models.Salon.category).all()
-    
-    # Преобразуем в удобный формат
-    categories_data = []
-    for cat in categories:
-        if cat[0]:  # Проверяем что категория не пустая
-            categories_data.append({
-                "name": cat[0],
-                "count": cat[1]
-            })
-    
-    # Последние отзывы
-    recent_reviews = db.query(models.Review).join(
-        models.Salon
-    ).order_by(
-        models.Review.created_at.desc()
-    ).limit(4).all()
-    
-    # Популярные статьи блога
-    blog_posts = db.query(models.BlogPost).filter(
-        models.BlogPost.is_published == True
-    ).order_by(
-        models.BlogPost.views_count.desc()
-    ).limit(3).all()
-    
-    # Районы с количеством салонов
-    districts = db.query(
-        models.Salon.district,
-        func.count(models.Salon.id).label('count')
-    ).group_by(models.Salon.district).all()
-    
-    # Преобразуем в удобный формат
-    districts_data = []
-    for dist in districts:
-        if dist[0]:  # Проверяем что район не пустой
-            districts_data.append({
-                "name": dist[0],
-                "count": dist[1]
-            })
-    
-    # Максимальное количество салонов в районе (для прогресс-бара)
-    max_district_count = max([d["count"] for d in districts_data]) if districts_data else 1
-    
+def home(request: Request, db: Session = Depends(get_db)):
+    # Сводка считается заранее - здесь нет ни одного агрегирующего запроса
+    summary = get_home_summary(db)
+
     return templates.TemplateResponse("index.html", {
         "request": request,
         "title": "Красота в Гродно - Информационный ресурс о салонах красоты",
-        "stats": {
-            "total_salons": total_salons,
-            "total_reviews": total_reviews,
-            "average_rating": average_rating,
-            "total_categories": total_categories
-        },
-        "top_salons": top_salons,
-        "categories": categories_data,
-        "recent_reviews": recent_reviews,
-        "blog_posts": blog_posts,
-        "districts": districts_data,
-        "max_district_count": max_district_count,
+        **summary,
         "now": datetime.now()  # Для вычисления времени отзыва
     })
 
 
 @app.get("/contact", response_class=HTMLResponse)
-async def contact(request: Request, db: Session = Depends(get_db)):
+def contact(request: Request, db: Session = Depends(get_db)):
     return templates.TemplateResponse(
         "contact.html",
         {
@@ -116,172 +192,72 @@ async def contact(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/blog", response_class=HTMLResponse)
-async def blog(
+def blog(
     request: Request,
     page: int = Query(1, ge=1),
     category: Optional[str] = Query(None),
     tag: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
-    # Пагинация
-    items_per_page = 6
-    skip = (page - 1) * items_per_page
-
-    # Получаем посты
-    posts = crud.get_blog_posts(
+    # Одна версия блога на весь запрос: ключи кэшей количества, сайдбара и фрагмента
+    blog_version = get_version(db, BLOG)
+    listing = get_blog_page(
         db,
-        skip=skip,
-        limit=items_per_page,
+        page=page,
+        per_page=6,
         category=category,
         tag=tag,
         search=search,
-        only_published=True,
+        after=after,
+        version=blog_version,
     )
 
-    # Общее количество постов
-    total_items = (
-        db.query(models.BlogPost).filter(models.BlogPost.is_published == True).count()
-    )
-
-    if category:
-        total_items = (
-            db.query(models.BlogPost)
-            .filter(
-                models.BlogPost.is_published == True,
-                models.BlogPost.category == category,
-            )
-            .count()
-        )
-    elif tag:
-        total_items = (
-            db.query(func.count(models.BlogPost.id))
-            .join(models.BlogPost.tags)
-            .filter(models.BlogPost.is_published == True, models.BlogTag.name == tag)
-            .scalar()
-        )
-
-    total_pages = max(1, math.ceil(total_items / items_per_page))
-
-    # Получаем данные для сайдбара
-    categories = crud.get_blog_categories_with_counts(db)
-    popular_posts = crud.get_popular_posts(db, limit=2)
-    recent_posts = crud.get_recent_posts(db, limit=2)
-    popular_tags_result = crud.get_popular_tags(db, limit=10)
+    # Данные сайдбара загружаются, только если его фрагмент не в кэше
+    sidebar = lazy_mapping(lambda: get_blog_sidebar(db, blog_version), SIDEBAR_KEYS)
 
     return templates.TemplateResponse(
         "blog.html",
         {
             "request": request,
             "title": "Блог о красоте - Красота в Гродно",
-            "posts": posts,
-            "categories": categories,
-            "popular_posts": popular_posts,
-            "recent_posts": recent_posts,
-            "popular_tags": [tag[0] for tag in popular_tags_result],
+            **listing,
+            **sidebar,
+            "blog_version": blog_version,
             "current_category": category,
             "current_tag": tag,
             "search_query": search,
             "current_page": page,
-            "total_pages": total_pages,
-            "total_items": total_items,
         },
     )
 
 
 @app.get("/blog/{slug}", response_class=HTMLResponse)
-async def blog_post(request: Request, slug: str, db: Session = Depends(get_db)):
-    post = crud.get_blog_post_by_slug(db, slug)
+async def blog_post(request: Request, slug: str, db: AsyncSession = Depends(get_async_db)):
+    post = await crud_async.get_blog_post_by_slug(db, slug)
 
     if not post:
         return templates.TemplateResponse(
             "404.html", {"request": request, "title": "Пост не найден"}, status_code=404
         )
 
-    # Увеличиваем счетчик просмотров
-    crud.increment_post_views(db, post.id)
+    # Увеличиваем счетчик просмотров; при выдаче страницы из кэша - тоже
+    await crud_async.increment_post_views(db, post.id)
+    setattr(request.state, ON_HIT_STATE, ("blog_view", post.id))
 
     # Получаем комментарии
-    comments = crud.get_post_comments(db, post.id)
-
-    # Получаем предыдущий и следующий пост
-    prev_post = (
-        db.query(models.BlogPost)
-        .filter(
-            models.BlogPost.is_published == True,
-            models.BlogPost.created_at > post.created_at,
-        )
-        .order_by(models.BlogPost.created_at.asc())
-        .first()
-    )
-
-    next_post = (
-        db.query(models.BlogPost)
-        .filter(
-            models.BlogPost.is_published == True,
-            models.BlogPost.created_at < post.created_at,
-        )
-        .order_by(models.BlogPost.created_at.desc())
-        .first()
-    )
-
-    # Похожие посты (по категории и тегам)
-    similar_posts = []
-
-    # По категории
-    category_posts = (
-        db.query(models.BlogPost)
-        .filter(
-            models.BlogPost.is_published == True,
-            models.BlogPost.category == post.category,
-            models.BlogPost.id != post.id,
-        )
-        .order_by(models.BlogPost.created_at.desc())
-        .limit(3)
-        .all()
-    )
+    comments = await crud_async.get_post_comments(db, post.id)
 
-    similar_posts.extend(category_posts)
-
-    # По тегам (если есть)
-    if hasattr(post, "tags") and post.tags:
-        tag_ids = [tag.id for tag in post.tags]
-        tag_posts = (
-            db.query(models.BlogPost)
-            .join(models.post_tags)
-            .filter(
-                models.BlogPost.is_published == True,
-                models.BlogPost.id != post.id,
-                models.post_tags.c.tag_id.in_(tag_ids),
-            )
-            .distinct()
-            .limit(3)
-            .all()
-        )
+    # Предыдущий и следующий пост - соседи в отсортированном массиве статей
+    timeline = await db.run_sync(get_timeline)
+    prev_post, next_post = timeline.neighbours(post.id, post.created_at)
 
-        # Добавляем только новые посты
-        existing_ids = [p.id for p in similar_posts]
-        for tag_post in tag_posts:
-            if tag_post.id not in existing_ids and len(similar_posts) < 6:
-                similar_posts.append(tag_post)
-
-    # Если мало постов, добавляем последние
-    if len(similar_posts) < 4:
-        recent_posts = (
-            db.query(models.BlogPost)
-            .filter(models.BlogPost.is_published == True, models.BlogPost.id != post.id)
-            .order_by(models.BlogPost.created_at.desc())
-            .limit(3)
-            .all()
-        )
-
-        existing_ids = [p.id for p in similar_posts]
-        for recent_post in recent_posts:
-            if recent_post.id not in existing_ids and len(similar_posts) < 6:
-                similar_posts.append(recent_post)
+    # Похожие посты - из заранее посчитанного индекса, одним запросом
+    similar_posts = await crud_async.get_similar_posts(db, post.id, limit=4, category=post.category)
 
-    # Получаем теги поста
-    tags = post.tags if hasattr(post, "tags") else []
+    # Теги поста загружены вместе с ним (selectinload)
+    tags = post.tags
 
     return templates.TemplateResponse(
         "blog-post.html",
@@ -290,7 +266,7 @@ async def blog_post(request: Request, slug: str, db: Session = Depends(get_db)):
             "title": post.title + " - Красота в Гродно",
             "post": post,
             "comments": comments,
-            "similar_posts": similar_posts[:4],  # Ограничиваем 3 постами
+            "similar_posts": similar_posts,
             "prev_post": prev_post,
             "next_post": next_post,
             "tags": tags,
@@ -305,14 +281,14 @@ async def add_comment(
     author_name: str = Form(...),
     content: str = Form(...),
     author_email: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    post = crud.get_blog_post_by_slug(db, slug)
+    post = await crud_async.get_blog_post_by_slug(db, slug)
 
     if not post:
         raise HTTPException(status_code=404, detail="Пост не найден")
 
-    comment = crud.create_comment(
+    comment = await crud_async.create_comment(
         db,
         post_id=post.id,
         author_name=author_name,
@@ -324,8 +300,8 @@ async def add_comment(
 
 
 @app.get("/api/blog/search")
-async def blog_search(q: str = Query("", min_length=1), db: Session = Depends(get_db)):
-    posts = crud.get_blog_posts(db, search=q, limit=5, only_published=True)
+async def blog_search(q: str = Query("", min_length=1), db: AsyncSession = Depends(get_async_db)):
+    posts = await crud_async.get_blog_posts(db, search=q, limit=5, only_published=True)
 
     results = []
     for post in posts:
@@ -343,163 +319,89 @@ async def blog_search(q: str = Query("", min_length=1), db: Session = Depends(ge
     return JSONResponse(content={"results": results})
 
 
+def parse_rating(min_rating: Optional[str]) -> Optional[float]:
+    if not min_rating:
+        return None
+    try:
+        return float(min_rating)
+    except ValueError:
+        return None
+
+
 @app.get("/catalog", response_class=HTMLResponse)
-async def catalog(
+def catalog(
     request: Request,
     category: Optional[str] = Query(None),
     district: Optional[str] = Query(None),
     min_rating: Optional[str] = Query(None),
     sort_by: str = Query("popular"),
     page: int = Query(1, ge=1),
+    after: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
-    # Базовый запрос
-    query = db.query(models.Salon)
+    rating_value = parse_rating(min_rating)
+    items_per_page = 6
+    sort_keys = salon_sort(sort_by)
+    next_cursor = None
+
+    snapshot = get_catalog_snapshot(db)
+    if snapshot is not None:
+        # Фильтрация, сортировка и пагинация по снимку в памяти
+        matched = snapshot.filter(category, district, rating_value, sort_by)
+        total_items = len(matched)
+        total_pages = max(1, math.ceil(total_items / items_per_page))
+        page = min(page, total_pages)
+        if after or page == 1:
+            salons, next_cursor = snapshot_page(matched, sort_keys, after, items_per_page)
+        else:
+            offset = (page - 1) * items_per_page
+            salons = matched[offset : offset + items_per_page]
+        facets = snapshot.facets(category, district, rating_value)
+    else:
+        # Базовый запрос
+        query = db.query(models.Salon)
 
-    # Применяем фильтры
-    if category:
-        query = query.filter(func.lower(models.Salon.category) == func.lower(category))
-    if district:
-        query = query.filter(func.lower(models.Salon.district) == func.lower(district))
+        # Применяем фильтры
+        if category:
+            query = query.filter(func.lower(models.Salon.category) == func.lower(category))
+        if district:
+            query = query.filter(func.lower(models.Salon.district) == func.lower(district))
 
-    if min_rating and min_rating != "":
-        try:
-            rating_value = float(min_rating)
+        if rating_value is not None:
             query = query.filter(models.Salon.rating >= rating_value)
-        except ValueError:
-            pass
-
-    # Применяем сортировку
-    if sort_by == "rating":
-        query = query.order_by(models.Salon.rating.desc())
-    elif sort_by == "reviews":
-        query = query.order_by(models.Salon.reviews_count.desc())
-    elif sort_by == "name":
-        query = query.order_by(models.Salon.name.asc())
-    else:
-        query = query.order_by(
-            models.Salon.rating.desc(), models.Salon.reviews_count.desc()
-        )
 
-    # Пагинация
-    items_per_page = 6
-    total_items = query.count()
-    total_pages = max(1, math.ceil(total_items / items_per_page))
-
-    # Корректируем номер страницы
-    page = min(page, total_pages)
-
-    # Получаем элементы для текущей страницы
-    offset = (page - 1) * items_per_page
-    salons = query.offset(offset).limit(items_per_page).all()
-
-    # Получаем уникальные категории и районы для фильтров
-    categories = db.query(models.Salon.category).distinct().all()
-    categories = [cat[0] for cat in categories if cat[0]]
-
-    districts = db.query(models.Salon.district).distinct().all()
-    districts = [dist[0] for dist in districts if dist[0]]
-
-    # Подсчет салонов
-    category_counts = {}
-    for cat in categories:
-        count = (
-            db.query(models.Salon)
-            .filter(func.lower(models.Salon.category) == func.lower(cat))
-            .count()
+        # Общее количество кэшируется до изменения данных салонов
+        total_items = count_cache.get(
+            db, SALONS, ("catalog", category, district, rating_value), query.count
         )
-        category_counts[cat] = count
-
-    district_counts = {}
-    for dist in districts:
-        count = (
-            db.query(models.Salon)
-            .filter(func.lower(models.Salon.district) == func.lower(dist))
-            .count()
-        )
-        district_counts[dist] = count
-
-    current_min_rating = min_rating if min_rating else ""
-
-    # В функции catalog(), после получения categories и districts:
-    category_counts = {}
-    district_counts = {}
+        total_pages = max(1, math.ceil(total_items / items_per_page))
 
-    # Подсчет салонов в каждой категории (с учетом всех фильтров кроме текущей категории)
-    for cat in categories:
-        query = db.query(models.Salon).filter(
-            func.lower(models.Salon.category) == func.lower(cat)
-        )
+        # Корректируем номер страницы
+        page = min(page, total_pages)
 
-        # Применяем фильтр по району, если выбран
-        if district:
-            query = query.filter(
-                func.lower(models.Salon.district) == func.lower(district)
+        if after or page == 1:
+            # Курсор по ключу сортировки (с id в конце) вместо OFFSET
+            salons, next_cursor = keyset_page(query, sort_keys, after, items_per_page)
+        else:
+            # Переход на произвольную страницу по номеру
+            offset = (page - 1) * items_per_page
+            salons = (
+                query.order_by(*keyset_order(sort_keys))
+                .offset(offset)
+                .limit(items_per_page)
+                .all()
             )
 
-        # Применяем фильтр по рейтингу, если выбран
-        if min_rating and min_rating != "":
-            try:
-                rating_value = float(min_rating)
-                query = query.filter(models.Salon.rating >= rating_value)
-            except ValueError:
-                pass
-
-        category_counts[cat] = query.count()
-
-    # Подсчет салонов в каждом районе (с учетом всех фильтров кроме текущего района)
-    for dist in districts:
-        query = db.query(models.Salon).filter(
-            func.lower(models.Salon.district) == func.lower(dist)
+        # Категории, районы и счетчики для фильтров - одним запросом,
+        # если фрагмент фильтров не в кэше
+        facets = lazy_mapping(
+            lambda: get_cached_salon_facets(
+                db, category=category, district=district, min_rating=rating_value
+            ),
+            FACET_KEYS,
         )
 
-        # Применяем фильтр по категории, если выбран
-        if category:
-            query = query.filter(
-                func.lower(models.Salon.category) == func.lower(category)
-            )
-
-        # Применяем фильтр по рейтингу, если выбран
-        if min_rating and min_rating != "":
-            try:
-                rating_value = float(min_rating)
-                query = query.filter(models.Salon.rating >= rating_value)
-            except ValueError:
-                pass
-
-        district_counts[dist] = query.count()
-
-    # Подсчет для "Все категории" (с учетом района и рейтинга)
-    all_categories_query = db.query(models.Salon)
-    if district:
-        all_categories_query = all_categories_query.filter(
-            func.lower(models.Salon.district) == func.lower(district)
-        )
-    if min_rating and min_rating != "":
-        try:
-            rating_value = float(min_rating)
-            all_categories_query = all_categories_query.filter(
-                models.Salon.rating >= rating_value
-            )
-        except ValueError:
-            pass
-    all_categories_count = all_categories_query.count()
-
-    # Подсчет для "Все районы" (с учетом категории и рейтинга)
-    all_districts_query = db.query(models.Salon)
-    if category:
-        all_districts_query = all_districts_query.filter(
-            func.lower(models.Salon.category) == func.lower(category)
-        )
-    if min_rating and min_rating != "":
-        try:
-            rating_value = float(min_rating)
-            all_districts_query = all_districts_query.filter(
-                models.Salon.rating >= rating_value
-            )
-        except ValueError:
-            pass
-    all_districts_count = all_districts_query.count()
+    current_min_rating = min_rating if min_rating else ""
 
     return templates.TemplateResponse(
         "catalog.html",
@@ -507,12 +409,8 @@ async def catalog(
             "request": request,
             "title": "Каталог салонов",
             "salons": salons,
-            "categories": categories,
-            "districts": districts,
-            "all_categories_count": all_categories_count,  # Добавить
-            "all_districts_count": all_districts_count,  # Добавить
-            "category_counts": category_counts,
-            "district_counts": district_counts,
+            **facets,
+            "salons_version": get_version(db, SALONS),
             "current_category": category,
             "current_district": district,
             "current_rating": current_min_rating,
@@ -521,6 +419,7 @@ async def catalog(
             "total_pages": total_pages,
             "total_items": total_items,
             "items_per_page": items_per_page,
+            "next_cursor": next_cursor,
         },
     )
 
@@ -529,9 +428,9 @@ async def catalog(
 async def salon_detail(
     request: Request,
     salon_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    salon = db.query(models.Salon).filter(models.Salon.id == salon_id).first()
+    salon = await crud_async.get_salon_with_details(db, salon_id)
     
     if not salon:
         return templates.TemplateResponse("404.html", {
@@ -539,8 +438,8 @@ async def salon_detail(
             "title": "Салон не найден"
         }, status_code=404)
     
-    # Получаем услуги
-    services = db.query(models.Service).filter(models.Service.salon_id == salon_id).all()
+    # Услуги и отзывы загружены вместе с салоном (selectinload)
+    services = salon.services
     
     # Группируем услуги по категориям
     services_by_category = {}
@@ -549,8 +448,7 @@ async def salon_detail(
             services_by_category[service.category] = []
         services_by_category[service.category].append(service)
     
-    # Получаем отзывы
-    reviews = db.query(models.Review).filter(models.Review.salon_id == salon_id).all()
+    reviews = salon.reviews
     
     return templates.TemplateResponse("salon-detail.html", {
         "request": request,
@@ -563,60 +461,46 @@ async def salon_detail(
 
 
 @app.post("/catalog/search")
-async def catalog_search(
+def catalog_search(
     request: Request,
     search_query: str = Form(""),
     page: int = Form(1),
     db: Session = Depends(get_db),
 ):
     if search_query:
-        # Поиск без учета регистра
-        search_term = f"%{search_query}%"
-        base_query = db.query(models.Salon).filter(
-            or_(
-                func.lower(models.Salon.name).like(func.lower(search_term)),
-                func.lower(models.Salon.description).like(func.lower(search_term)),
-                func.lower(models.Salon.address).like(func.lower(search_term)),
-                func.lower(models.Salon.district).like(func.lower(search_term)),
-                func.lower(models.Salon.category).like(func.lower(search_term)),
-            )
-        )
-
-        # Пагинация
         items_per_page = 6
-        total_items = base_query.count()
-        total_pages = max(1, math.ceil(total_items / items_per_page))
 
-        # Корректируем номер страницы
-        page = min(page, total_pages)
+        snapshot = get_catalog_snapshot(db)
+        if snapshot is not None:
+            ranked_ids = search_salon_ids(db, search_query)
+            if ranked_ids is not None:
+                matched = [snapshot.by_id[i] for i in ranked_ids if i in snapshot.by_id]
+            else:
+                matched = snapshot.search(search_query)
+            total_items = len(matched)
+            total_pages = max(1, math.ceil(total_items / items_per_page))
+            page = min(page, total_pages)
+            offset = (page - 1) * items_per_page
+            salons = matched[offset : offset + items_per_page]
+            facets = snapshot.facets()
+        else:
+            # Полнотекстовый поиск, лучшие совпадения первыми
+            base_query = apply_salon_search(db.query(models.Salon), search_query)
+
+            # Пагинация; количество кэшируется до изменения данных салонов
+            total_items = count_cache.get(
+                db, SALONS, ("search", search_query), base_query.count
+            )
+            total_pages = max(1, math.ceil(total_items / items_per_page))
 
-        # Получаем элементы для текущей страницы
-        offset = (page - 1) * items_per_page
-        salons = base_query.offset(offset).limit(items_per_page).all()
+            # Корректируем номер страницы
+            page = min(page, total_pages)
 
-        categories = db.query(models.Salon.category).distinct().all()
-        categories = [cat[0] for cat in categories if cat[0]]
+            # Получаем элементы для текущей страницы
+            offset = (page - 1) * items_per_page
+            salons = base_query.offset(offset).limit(items_per_page).all()
 
-        districts = db.query(models.Salon.district).distinct().all()
-        districts = [dist[0] for dist in districts if dist[0]]
-
-        category_counts = {}
-        for cat in categories:
-            count = (
-                db.query(models.Salon)
-                .filter(func.lower(models.Salon.category) == func.lower(cat))
-                .count()
-            )
-            category_counts[cat] = count
-
-        district_counts = {}
-        for dist in districts:
-            count = (
-                db.query(models.Salon)
-                .filter(func.lower(models.Salon.district) == func.lower(dist))
-                .count()
-            )
-            district_counts[dist] = count
+            facets = lazy_mapping(lambda: get_cached_salon_facets(db), FACET_KEYS)
 
         return templates.TemplateResponse(
             "catalog.html",
@@ -624,10 +508,8 @@ async def catalog_search(
                 "request": request,
                 "title": f"Результаты поиска: {search_query}",
                 "salons": salons,
-                "categories": categories,
-                "districts": districts,
-                "category_counts": category_counts,
-                "district_counts": district_counts,
+                **facets,
+                "salons_version": get_version(db, SALONS),
                 "search_query": search_query,
                 "current_page": page,
                 "total_pages": total_pages,
@@ -641,71 +523,17 @@ async def catalog_search(
 
 # Новый эндпоинт для автодополнения поиска
 @app.get("/api/search/autocomplete")
-async def search_autocomplete(
+def search_autocomplete(
     q: str = Query("", min_length=1), db: Session = Depends(get_db)
 ):
-    # Поиск без учета регистра
-    search_term = f"%{q}%"
-
-    # Ищем салоны по названию
-    salons = (
-        db.query(models.Salon)
-        .filter(func.lower(models.Salon.name).like(func.lower(search_term)))
-        .limit(10)
-        .all()
-    )
-
-    # Ищем по категориям
-    categories = (
-        db.query(models.Salon.category)
-        .filter(func.lower(models.Salon.category).like(func.lower(search_term)))
-        .distinct()
-        .limit(5)
-        .all()
-    )
-
-    # Ищем по районам
-    districts = (
-        db.query(models.Salon.district)
-        .filter(func.lower(models.Salon.district).like(func.lower(search_term)))
-        .distinct()
-        .limit(5)
-        .all()
-    )
-
-    # Формируем результаты
-    results = []
-
-    # Добавляем салоны
-    for salon in salons:
-        results.append(
-            {
-                "type": "salon",
-                "id": salon.id,
-                "name": salon.name,
-                "rating": salon.rating,
-                "category": salon.category,
-                "icon": "bi-shop",
-            }
-        )
-
-    # Добавляем категории
-    for category in categories:
-        if category[0]:
-            results.append({"type": "category", "name": category[0], "icon": "bi-tag"})
-
-    # Добавляем районы
-    for district in districts:
-        if district[0]:
-            results.append(
-                {"type": "district", "name": district[0], "icon": "bi-geo-alt"}
-            )
+    # Префиксный индекс в памяти - без запросов к таблице салонов
+    results = get_autocomplete_index(db).search(q)
 
     return JSONResponse(content={"results": results})
 
 
 @app.get("/login", response_class=HTMLResponse)
-async def login(request: Request, db: Session = Depends(get_db)):
+def login(request: Request, db: Session = Depends(get_db)):
     return templates.TemplateResponse(
         "login.html",
         {
@@ -716,7 +544,7 @@ async def login(request: Request, db: Session = Depends(get_db)):
 
 
 @app.get("/register", response_class=HTMLResponse)
-async def register(request: Request, db: Session = Depends(get_db)):
+def register(request: Request, db: Session = Depends(get_db)):
     return templates.TemplateResponse(
         "register.html",
         {
@@ -727,4 +555,5 @@ async def register(request: Request, db: Session = Depends(get_db)):
 
 
 if __name__ == "__main__":
+    prepare_database(engine)
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
@@ -0,0 +1,321 @@
+# metrics.py - метрики в текстовом формате Prometheus: GET /metrics
+#
+# Каждый процесс копит счетчики в памяти; при METRICS_DIR (общий каталог воркеров
+# gunicorn) периодически сбрасывает их в свой файл, а /metrics суммирует файлы всех
+# воркеров. Воркер удаляет свой файл при завершении, а при старте - файлы процессов,
+# которых уже нет (в том числе прежний файл со своим PID); файлы упавших воркеров
+# /metrics пропускает. Счетчики при этом уменьшаются - Prometheus считает это сбросом.
+import hmac
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+import config
+from sql_profiler import ProfiledTemplate
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RENDER_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5)
+POOL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+Labels = Tuple[str, ...]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels, amount: float = 1.0):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def dump(self) -> dict:
+        return {"\x1f".join(labels): value for labels, value in self.values.items()}
+
+    @staticmethod
+    def merge(total: dict, other: dict):
+        for key, value in other.items():
+            total[key] = total.get(key, 0.0) + value
+
+    def lines(self, merged: dict) -> Iterable[str]:
+        for key, value in sorted(merged.items()):
+            yield f"{self.name}{_labels(self.label_names, key.split(chr(31)) if key else [])} {_number(value)}"
+
+
+class Gauge(Counter):
+    """Текущее значение; значения воркеров складываются"""
+    kind = "gauge"
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets: Tuple[float, ...]):
+        super().__init__(name, help_text, label_names)
+        self.buckets = buckets
+        # labels -> [счетчики по корзинам (последняя - +Inf), сумма]
+        self.values: Dict[Labels, list] = {}
+
+    def observe(self, labels: Labels, value: float):
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def dump(self) -> dict:
+        return {"\x1f".join(labels): [list(counts), total] for labels, (counts, total) in self.values.items()}
+
+    @staticmethod
+    def merge(total: dict, other: dict):
+        for key, (counts, value_sum) in other.items():
+            state = total.setdefault(key, [[0] * len(counts), 0.0])
+            state[0] = [a + b for a, b in zip(state[0], counts)]
+            state[1] += value_sum
+
+    def lines(self, merged: dict) -> Iterable[str]:
+        for key, (counts, value_sum) in sorted(merged.items()):
+            values = key.split("\x1f") if key else []
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield f"{self.name}_bucket{_labels(self.label_names + ('le',), values + [le])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, values)} {_number(value_sum)}"
+            yield f"{self.name}_count{_labels(self.label_names, values)} {cumulative}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+# Одна блокировка на все метрики: обновления короткие, конкуренция только
+# между потоком цикла событий и пулом потоков
+_lock = threading.Lock()
+
+http_requests = Counter(
+    "http_requests_total", "HTTP-запросы по шаблону маршрута и коду ответа", ("method", "route", "status")
+)
+http_duration = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route"), LATENCY_BUCKETS
+)
+template_render = Histogram(
+    "template_render_seconds", "Время рендеринга шаблона Jinja2", ("template",), RENDER_BUCKETS
+)
+pool_in_use = Gauge(
+    "db_pool_connections_in_use", "Соединения, выданные из пула SQLAlchemy", ("engine",)
+)
+pool_hold = Histogram(
+    "db_pool_connection_hold_seconds", "Время от выдачи соединения из пула до возврата", ("engine",),
+    POOL_BUCKETS,
+)
+cache_lookups = Counter(
+    "cache_lookups_total", "Обращения к кэшам: страницы, фрагменты, данные", ("cache", "result")
+)
+
+METRICS = (http_requests, http_duration, template_render, pool_in_use, pool_hold, cache_lookups)
+
+
+def cache_lookup(cache: str, hit: bool):
+    if config.METRICS:
+        cache_lookups.inc((cache, "hit" if hit else "miss"))
+
+
+# --- Мультипроцессный режим ---
+
+def _state() -> dict:
+    with _lock:
+        return {metric.name: metric.dump() for metric in METRICS}
+
+
+def _path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"metrics_{pid}.json")
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _worker_files(directory: str) -> Iterable[Tuple[int, str]]:
+    for name in os.listdir(directory):
+        pid = name[len("metrics_"):-len(".json")]
+        if name.startswith("metrics_") and name.endswith(".json") and pid.isdigit():
+            yield int(pid), os.path.join(directory, name)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def clear_stale(directory: Optional[str] = None):
+    """При старте воркера: файлы завершившихся процессов и прежний файл с тем же PID"""
+    directory = directory or config.METRICS_DIR
+    if not directory or not os.path.isdir(directory):
+        return
+    for pid, path in _worker_files(directory):
+        if pid == os.getpid() or not _alive(pid):
+            _remove(path)
+
+
+def remove_own(directory: Optional[str] = None):
+    """При завершении воркера: его счетчики больше не учитываются"""
+    directory = directory or config.METRICS_DIR
+    if directory:
+        _remove(_path(directory, os.getpid()))
+
+
+def flush(directory: Optional[str] = None):
+    """Записывает счетчики процесса в его файл (атомарно, через переименование)"""
+    directory = directory or config.METRICS_DIR
+    if not directory:
+        return
+    path = _path(directory, os.getpid())
+    temporary = path + ".tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(_state(), file)
+    os.replace(temporary, path)
+
+
+def collect(directory: Optional[str] = None) -> dict:
+    """Счетчики всех воркеров: файлы остальных процессов плюс живое состояние текущего"""
+    directory = directory or config.METRICS_DIR
+    states = [_state()]
+    if directory and os.path.isdir(directory):
+        for pid, path in _worker_files(directory):
+            # Свое состояние - из памяти; упавший воркер не успел убрать файл
+            if pid == os.getpid() or not _alive(pid):
+                continue
+            try:
+                with open(path, encoding="utf-8") as file:
+                    states.append(json.load(file))
+            except (OSError, ValueError):
+                continue
+
+    merged = {metric.name: {} for metric in METRICS}
+    for state in states:
+        for metric in METRICS:
+            metric.merge(merged[metric.name], state.get(metric.name, {}))
+    return merged
+
+
+def render(directory: Optional[str] = None) -> str:
+    merged = collect(directory)
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.lines(merged[metric.name]))
+    return "\n".join(lines) + "\n"
+
+
+# --- Источники метрик ---
+
+class MeteredTemplate(ProfiledTemplate):
+    """Время рендеринга каждого шаблона (по имени файла)"""
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            template_render.observe((self.name or "<string>",), time.perf_counter() - started)
+
+
+def instrument_pool(engine: Engine, name: str):
+    """Выданные соединения и время их удержания - по событиям пула checkout/checkin;
+    слушатели на Engine переходят и на новый пул после dispose()"""
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        # record_info сохраняется и при переподключении записи пула
+        connection_record.record_info["metrics_checkout"] = time.perf_counter()
+        pool_in_use.inc((name,))
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        started = connection_record.record_info.pop("metrics_checkout", None)
+        if started is not None:
+            pool_in_use.inc((name,), -1.0)
+            pool_hold.observe((name,), time.perf_counter() - started)
+
+
+def scrape_allowed(request) -> bool:
+    """С METRICS_TOKEN - по заголовку Authorization: Bearer, без него - только с localhost"""
+    if config.METRICS_TOKEN:
+        expected = f"Bearer {config.METRICS_TOKEN}"
+        return hmac.compare_digest(request.headers.get("authorization", ""), expected)
+    return request.client is not None and request.client.host in ("127.0.0.1", "::1")
+
+
+def route_template(app, scope) -> str:
+    """Шаблон пути маршрута (/blog/{slug}), а не сам URL - ограниченное число меток"""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "other")
+    return "other"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: количество и время запросов по маршрутам, попадания в кэш страниц"""
+
+    def __init__(self, app, skip_paths=("/metrics",)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for header, value in message.get("headers", []):
+                    if header == b"x-cache":
+                        cache_lookup("page", value == b"HIT")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            # Starlette кладет приложение в scope до стека middleware
+            route = route_template(scope["app"], scope) if "app" in scope else "other"
+            http_requests.inc((scope["method"], route, str(status)))
+            http_duration.observe((scope["method"], route), time.perf_counter() - started)
@@ -0,0 +1,100 @@
+# migrations.py - обновление схемы существующей базы (site.db) на месте
+# Запуск вручную: python migrations.py
+import sys
+import os
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, select
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.engine import Connection, Engine
+
+import models
+from ratings import recompute_salon_ratings
+from search_index import ensure_search_index, recreate_update_triggers
+
+
+def create_missing_indexes(connection: Connection):
+    # Индексы из models.py, которых еще нет в базе (create_all их не добавляет
+    # к уже существующим таблицам)
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+    # Статистика планировщика для новых индексов
+    if connection.dialect.name in ("sqlite", "postgresql"):
+        connection.exec_driver_sql("ANALYZE")
+
+
+def add_missing_columns(connection: Connection, table):
+    existing = {column["name"] for column in inspect(connection).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(connection.dialect)}"
+        if column.server_default is not None:
+            ddl += f" DEFAULT {column.server_default.arg}"
+        connection.exec_driver_sql(ddl)
+
+
+def add_review_aggregates(connection: Connection):
+    # Новые колонки салона и первый пересчет из таблицы reviews
+    add_missing_columns(connection, models.Salon.__table__)
+    recompute_salon_ratings(connection)
+
+
+def keyset_sort_indexes(connection: Connection):
+    # Индексы сортировок каталога и ленты блога с id в конце; прежний индекс
+    # ленты (is_published, created_at) заменен
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_blog_posts_published_created_at")
+    create_missing_indexes(connection)
+
+
+# Миграции применяются по порядку и только один раз
+MIGRATIONS = [
+    (1, "catalog and blog indexes", create_missing_indexes),
+    (2, "salon review aggregates", add_review_aggregates),
+    # 3 - бывшее заполнение similar_posts: индекс строится командой python similar_posts.py
+    # или при первом инкрементальном пересчете
+    (4, "search index update triggers", recreate_update_triggers),
+    (5, "keyset sort indexes", keyset_sort_indexes),
+]
+
+
+def upgrade(engine: Engine) -> list:
+    """Создает недостающие таблицы и применяет новые миграции"""
+    models.Base.metadata.create_all(bind=engine)
+
+    applied = []
+    with engine.begin() as connection:
+        done = set(connection.execute(select(models.SchemaMigration.version)).scalars())
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            migrate(connection)
+            connection.execute(
+                models.SchemaMigration.__table__.insert().values(
+                    version=version, name=name, applied_at=datetime.utcnow()
+                )
+            )
+            applied.append(name)
+    return applied
+
+
+def prepare_database(engine: Engine) -> list:
+    """Миграции и полнотекстовые индексы - один раз перед запуском воркеров
+    (python migrations.py или хук on_starting в gunicorn.conf.py), не при импорте main"""
+    applied = upgrade(engine)
+    ensure_search_index(engine)
+    return applied
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    applied = prepare_database(engine)
+    if applied:
+        for name in applied:
+            print(f"✅ Применена миграция: {name}")
+    else:
+        print("База данных уже в актуальном состоянии")
@@ -1,10 +1,23 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 from database import Base
 from datetime import datetime
 
 
+# Замены NULL в ключах сортировки каталога - меньше любого настоящего значения
+RATING_UNSET = -1.0
+REVIEWS_UNSET = -1
+NAME_UNSET = ""
+
+
+def nulls_as(column, value):
+    """coalesce(column, value) с литералом, а не параметром: выражение запроса
+    совпадает с выражением индекса"""
+    literal = "'" + value.replace("'", "''") + "'" if isinstance(value, str) else repr(value)
+    return func.coalesce(column, literal_column(literal))
+
+
 class Salon(Base):
     __tablename__ = "salons"
     
@@ -18,6 +31,13 @@ class Salon(Base):
     working_hours = Column(String(200))
     rating = Column(Float, default=0.0)
     reviews_count = Column(Integer, default=0)
+    # Агрегаты отзывов - обновляются при каждой записи Review (см. ratings.py)
+    rating_sum = Column(Integer, default=0, server_default="0")
+    stars_1 = Column(Integer, default=0, server_default="0")
+    stars_2 = Column(Integer, default=0, server_default="0")
+    stars_3 = Column(Integer, default=0, server_default="0")
+    stars_4 = Column(Integer, default=0, server_default="0")
+    stars_5 = Column(Integer, default=0, server_default="0")
     is_verified = Column(Boolean, default=False)
     image_url = Column(String(300), default="/static/img/default.png")  # Одно фото для салона
     created_at = Column(DateTime, server_default=func.now())
@@ -26,6 +46,25 @@ class Salon(Base):
     services = relationship("Service", back_populates="salon", cascade="all, delete-orphan")
     reviews = relationship("Review", back_populates="salon", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Фильтры каталога и сортировка "популярные"
+        Index("ix_salons_category_district_rating", category, district, rating),
+        Index("ix_salons_district_rating", district, rating),
+        Index("ix_salons_rating_reviews_count", rating, reviews_count),
+        Index("ix_salons_reviews_count", reviews_count),
+        # catalog() сравнивает lower(category) / lower(district)
+        Index("ix_salons_lower_category", func.lower(category)),
+        Index("ix_salons_lower_district", func.lower(district)),
+        # Сортировки каталога с id в конце: курсор страницы - поиск по индексу
+        Index("ix_salons_sort_rating", nulls_as(rating, RATING_UNSET), id),
+        Index("ix_salons_sort_reviews", nulls_as(reviews_count, REVIEWS_UNSET), id),
+        Index("ix_salons_sort_name", nulls_as(name, NAME_UNSET), id),
+        Index(
+            "ix_salons_sort_popular",
+            nulls_as(rating, RATING_UNSET), nulls_as(reviews_count, REVIEWS_UNSET), id,
+        ),
+    )
+
 
 class Service(Base):
     __tablename__ = "services"
@@ -39,6 +78,10 @@ class Service(Base):
     
     salon = relationship("Salon", back_populates="services")
 
+    __table_args__ = (
+        Index("ix_services_salon_id_category", salon_id, category),
+    )
+
 
 class Review(Base):
     __tablename__ = "reviews"
@@ -53,11 +96,18 @@ class Review(Base):
     
     salon = relationship("Salon", back_populates="reviews")
 
+    __table_args__ = (
+        Index("ix_reviews_salon_id_created_at", salon_id, created_at),
+        Index("ix_reviews_created_at", created_at),
+    )
+
 post_tags = Table(
     'post_tags',
     Base.metadata,
     Column('post_id', Integer, ForeignKey('blog_posts.id', ondelete='CASCADE'), primary_key=True),
-    Column('tag_id', Integer, ForeignKey('blog_tags.id', ondelete='CASCADE'), primary_key=True)
+    Column('tag_id', Integer, ForeignKey('blog_tags.id', ondelete='CASCADE'), primary_key=True),
+    # Первичный ключ начинается с post_id - для выборки статей по тегу нужен обратный индекс
+    Index('ix_post_tags_tag_id_post_id', 'tag_id', 'post_id')
 )
 
 class BlogPost(Base):
@@ -73,13 +123,20 @@ class BlogPost(Base):
     category = Column(String(50))
     is_published = Column(Boolean, default=True)
     views_count = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Связи
     comments = relationship("BlogComment", back_populates="post", cascade="all, delete-orphan")
     tags = relationship("BlogTag", secondary=post_tags, back_populates="posts")
 
+    __table_args__ = (
+        # Лента блога, популярные статьи и фильтр по категории
+        Index("ix_blog_posts_published_created_at_id", is_published, created_at, id),
+        Index("ix_blog_posts_published_views_count", is_published, views_count),
+        Index("ix_blog_posts_category_published_created_at", category, is_published, created_at),
+    )
+
 class BlogCategory(Base):
     __tablename__ = "blog_categories"
     
@@ -111,4 +168,40 @@ class BlogComment(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Связи
-    post = relationship("BlogPost", back_populates="comments")
\ No newline at end of file
+    post = relationship("BlogPost", back_populates="comments")
+
+    __table_args__ = (
+        Index("ix_blog_comments_post_id_approved_created_at", post_id, is_approved, created_at),
+    )
+
+
+class SimilarPost(Base):
+    __tablename__ = "similar_posts"
+
+    # Топ похожих статей для каждой статьи (см. similar_posts.py)
+    post_id = Column(Integer, ForeignKey("blog_posts.id", ondelete="CASCADE"), primary_key=True)
+    similar_id = Column(Integer, ForeignKey("blog_posts.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_similar_posts_post_id_rank", "post_id", "rank"),
+    )
+
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+
+    # Счетчик версии данных (salons, blog) - увеличивается при каждой записи,
+    # по нему воркеры узнают, что пора обновить свои кэши
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    # Примененные миграции схемы (см. migrations.py)
+    version = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
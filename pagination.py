@@ -0,0 +1,200 @@
+# pagination.py - курсорная (keyset) пагинация и кэш общего количества записей
+import base64
+import binascii
+import json
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, literal, tuple_
+from sqlalchemy.orm import Session
+
+import models
+from data_version import get_version
+
+# Ключ сортировки: (колонка, по убыванию, замена NULL или None); последним идет id.
+# Все части ключа в одном направлении: условие курсора - сравнение кортежей
+# (row value), которое SQLite и PostgreSQL выполняют поиском по индексу из
+# тех же выражений (models.Salon: ix_salons_sort_*)
+SortKey = Sequence[Tuple[Any, bool, Any]]
+
+SALON_SORTS = {
+    "rating": (
+        (models.Salon.rating, True, models.RATING_UNSET),
+        (models.Salon.id, True, None),
+    ),
+    "reviews": (
+        (models.Salon.reviews_count, True, models.REVIEWS_UNSET),
+        (models.Salon.id, True, None),
+    ),
+    "name": (
+        (models.Salon.name, False, models.NAME_UNSET),
+        (models.Salon.id, False, None),
+    ),
+    "popular": (
+        (models.Salon.rating, True, models.RATING_UNSET),
+        (models.Salon.reviews_count, True, models.REVIEWS_UNSET),
+        (models.Salon.id, True, None),
+    ),
+}
+
+BLOG_SORT = ((models.BlogPost.created_at, True, None), (models.BlogPost.id, True, None))
+
+
+def salon_sort(sort_by: str) -> SortKey:
+    return SALON_SORTS.get(sort_by, SALON_SORTS["popular"])
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+# NULL в ключе заменяется значением меньше любого настоящего (coalesce): при
+# убывании такие записи идут последними, при возрастании - первыми
+
+
+class InvalidCursor(ValueError):
+    """Испорченный токен ?after= или токен от другой сортировки"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Непрозрачный токен для ?after= из значений ключа последней записи"""
+    raw = json.dumps([_plain(value) for value in values], ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str], keys: SortKey) -> Optional[list]:
+    """Значения ключа из токена; None без токена, InvalidCursor для испорченного"""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, ValueError):
+        raise InvalidCursor(token)
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor(token)
+
+    decoded = []
+    for (column, _, _), value in zip(keys, values):
+        try:
+            if column.type.python_type is datetime:
+                value = datetime.fromisoformat(value)
+            else:
+                value = column.type.python_type(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor(token)
+        decoded.append(value)
+    return decoded
+
+
+def _value(item, column, null_as):
+    value = getattr(item, column.key)
+    return null_as if value is None else value
+
+
+def row_key(item, keys: SortKey) -> list:
+    return [_value(item, column, null_as) for column, _, null_as in keys]
+
+
+def _expression(column, null_as):
+    return column if null_as is None else models.nulls_as(column, null_as)
+
+
+def keyset_filter(keys: SortKey, values: Sequence[Any]):
+    """Условие "строго после курсора": (a, b, id) < (:a, :b, :id) при убывании"""
+    expressions = [_expression(column, null_as) for column, _, null_as in keys]
+    bounds = [literal(value, column.type) for (column, _, _), value in zip(keys, values)]
+    if keys[0][1]:
+        # Граница по первой части ключа отдельно: SQLite не ищет по индексу из
+        # выражений (coalesce) по одному сравнению кортежей
+        return and_(expressions[0] <= bounds[0], tuple_(*expressions) < tuple_(*bounds))
+    return and_(expressions[0] >= bounds[0], tuple_(*expressions) > tuple_(*bounds))
+
+
+def keyset_order(keys: SortKey):
+    return [
+        _expression(column, null_as).desc() if descending else _expression(column, null_as).asc()
+        for column, descending, null_as in keys
+    ]
+
+
+def is_after(item_values: Sequence[Any], values: Sequence[Any], keys: SortKey) -> bool:
+    """То же условие, что keyset_filter, для значений в памяти"""
+    if keys[0][1]:
+        return tuple(item_values) < tuple(values)
+    return tuple(item_values) > tuple(values)
+
+
+def sort_records(items: Sequence[Any], keys: SortKey) -> List[Any]:
+    """Порядок keyset_order для записей в памяти"""
+    return sorted(items, key=lambda item: row_key(item, keys), reverse=keys[0][1])
+
+
+def keyset_page(query, keys: SortKey, after: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Страница после курсора и токен следующей страницы (None - дальше пусто)
+
+    Вместо OFFSET - сравнение кортежей, которое выполняется поиском по индексу
+    сортировки: без фильтров страница в глубине списка стоит как первая.
+    """
+    values = decode_cursor(after, keys)
+    if values is not None:
+        query = query.filter(keyset_filter(keys, values))
+    items = query.order_by(None).order_by(*keyset_order(keys)).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(row_key(items[-1], keys))
+    return items, next_cursor
+
+
+def snapshot_page(items: Sequence[Any], keys: SortKey, after: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """То же для уже отсортированного списка в памяти (снимок каталога)"""
+    values = decode_cursor(after, keys)
+    start = 0
+    if values is not None:
+        # По значениям ключа, а не по id: запись курсора могла уйти из снимка
+        start = next(
+            (position for position, item in enumerate(items) if is_after(row_key(item, keys), values, keys)),
+            len(items),
+        )
+
+    page = list(items[start : start + limit])
+    next_cursor = None
+    if start + limit < len(items):
+        next_cursor = encode_cursor(row_key(page[-1], keys))
+    return page, next_cursor
+
+
+class CountCache:
+    """Общее количество записей по ключу фильтров, пока не сменилась версия данных"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._counts: Dict[tuple, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self, db: Session, scope: str, key: tuple, count: Callable[[], int], version: Optional[int] = None
+    ) -> int:
+        if version is None:
+            version = get_version(db, scope)
+        cache_key = (scope,) + tuple(key)
+        cached = self._counts.get(cache_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        total = count()
+        with self._lock:
+            if len(self._counts) >= self.max_entries:
+                self._counts.clear()
+            self._counts[cache_key] = (version, total)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+count_cache = CountCache()
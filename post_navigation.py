@@ -0,0 +1,73 @@
+# post_navigation.py - соседние статьи (предыдущая/следующая) по отсортированному массиву
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+from data_version import BLOG, get_version
+
+
+class PostTimeline:
+    """Опубликованные статьи по (created_at, id); соседи - соседние элементы массива"""
+    __slots__ = ("version", "entries", "keys", "positions")
+
+    def __init__(self, version: int, rows):
+        self.version = version
+        self.entries = tuple(
+            {"id": row.id, "slug": row.slug, "title": row.title, "created_at": row.created_at}
+            for row in rows
+        )
+        self.keys = tuple((entry["created_at"], entry["id"]) for entry in self.entries)
+        self.positions = {entry["id"]: index for index, entry in enumerate(self.entries)}
+
+    def neighbours(self, post_id: int, created_at: datetime) -> Tuple[Optional[dict], Optional[dict]]:
+        """(предыдущая - более новая, следующая - более старая), как на странице статьи"""
+        index = self.positions.get(post_id)
+        if index is not None:
+            newer = index + 1
+            older = index - 1
+        else:
+            # Неопубликованная статья - место в массиве по дате
+            older = bisect_left(self.keys, (created_at, post_id)) - 1
+            newer = bisect_right(self.keys, (created_at, post_id))
+        prev_post = self.entries[newer] if newer < len(self.entries) else None
+        next_post = self.entries[older] if older >= 0 else None
+        return prev_post, next_post
+
+
+def build_timeline(db: Session, version: int) -> PostTimeline:
+    rows = db.execute(
+        select(
+            models.BlogPost.id,
+            models.BlogPost.slug,
+            models.BlogPost.title,
+            models.BlogPost.created_at,
+        ).where(
+            models.BlogPost.is_published == True,
+            models.BlogPost.created_at.is_not(None),
+        ).order_by(models.BlogPost.created_at, models.BlogPost.id)
+    ).all()
+    return PostTimeline(version, rows)
+
+
+_timeline: Optional[PostTimeline] = None
+
+
+def get_timeline(db: Session) -> PostTimeline:
+    """Актуальный массив; перестраивается при смене версии данных блога
+    (публикация, снятие с публикации, смена даты)"""
+    global _timeline
+    version = get_version(db, BLOG)
+    timeline = _timeline
+    if timeline is not None and timeline.version == version:
+        return timeline
+
+    # Без блокировки: через AsyncSession.run_sync запрос отдает управление циклу
+    # событий, и поток, ждущий блокировку, остановил бы весь цикл. Параллельная
+    # перестройка лишь повторит ту же работу, замена ссылки атомарна
+    timeline = build_timeline(db, version)
+    _timeline = timeline
+    return timeline
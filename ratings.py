@@ -0,0 +1,126 @@
+# ratings.py - агрегаты отзывов салона (количество, сумма, средняя, гистограмма)
+# Запуск вручную для исправления расхождений: python ratings.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from typing import Iterable, Optional
+
+from sqlalchemy import Float, Numeric, bindparam, case, cast, event, func, inspect, select, update
+from sqlalchemy.engine import Connection
+
+import models
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def _average(total, count):
+    # round(x, n) в PostgreSQL есть только для numeric
+    average = cast(cast(total, Float) / count, Numeric)
+    return case((count > 0, cast(func.round(average, 1), Float)), else_=0.0)
+
+
+def _apply_review(connection: Connection, salon_id: Optional[int], rating: Optional[int], sign: int):
+    """Добавляет (sign=1) или убирает (sign=-1) один отзыв из агрегатов салона"""
+    if salon_id is None or rating is None:
+        return
+    salons = models.Salon.__table__
+    count = func.coalesce(salons.c.reviews_count, 0) + sign
+    total = func.coalesce(salons.c.rating_sum, 0) + sign * rating
+    values = {
+        "reviews_count": count,
+        "rating_sum": total,
+        "rating": _average(total, count),
+    }
+    if rating in STARS:
+        column = salons.c[f"stars_{rating}"]
+        values[column.name] = func.coalesce(column, 0) + sign
+    connection.execute(update(salons).where(salons.c.id == salon_id).values(values))
+
+
+@event.listens_for(models.Review, "after_insert")
+def _review_inserted(mapper, connection, review):
+    _apply_review(connection, review.salon_id, review.rating, 1)
+
+
+@event.listens_for(models.Review, "after_delete")
+def _review_deleted(mapper, connection, review):
+    _apply_review(connection, review.salon_id, review.rating, -1)
+
+
+@event.listens_for(models.Review, "before_update")
+def _review_updated(mapper, connection, review):
+    state = inspect(review)
+    if not state.attrs.salon_id.history.has_changes() and not state.attrs.rating.history.has_changes():
+        return
+
+    # Старые значения берем из таблицы: у просроченного объекта их нет в истории
+    reviews = models.Review.__table__
+    old = connection.execute(
+        select(reviews.c.salon_id, reviews.c.rating).where(reviews.c.id == review.id)
+    ).first()
+    if old is not None:
+        _apply_review(connection, old.salon_id, old.rating, -1)
+    _apply_review(connection, review.salon_id, review.rating, 1)
+
+
+def recompute_salon_ratings(connection: Connection, salon_ids: Optional[Iterable[int]] = None) -> int:
+    """Полный пересчет агрегатов по таблице reviews; возвращает число салонов с отзывами"""
+    salons = models.Salon.__table__
+    reviews = models.Review.__table__
+
+    aggregate = select(
+        reviews.c.salon_id,
+        func.count(reviews.c.id).label("reviews_count"),
+        func.coalesce(func.sum(reviews.c.rating), 0).label("rating_sum"),
+        func.round(func.avg(reviews.c.rating), 1).label("rating"),
+        *[func.count(case((reviews.c.rating == star, 1))).label(f"stars_{star}") for star in STARS],
+    ).where(reviews.c.salon_id.is_not(None)).group_by(reviews.c.salon_id)
+
+    reset = update(salons).values(
+        reviews_count=0, rating_sum=0, rating=0.0, **{f"stars_{star}": 0 for star in STARS}
+    )
+    if salon_ids is not None:
+        salon_ids = list(salon_ids)
+        aggregate = aggregate.where(reviews.c.salon_id.in_(salon_ids))
+        reset = reset.where(salons.c.id.in_(salon_ids))
+
+    rows = connection.execute(aggregate).mappings().all()
+    connection.execute(reset)
+    if rows:
+        connection.execute(
+            update(salons)
+            .where(salons.c.id == bindparam("b_salon_id"))
+            .values(
+                reviews_count=bindparam("b_reviews_count"),
+                rating_sum=bindparam("b_rating_sum"),
+                rating=bindparam("b_rating"),
+                **{f"stars_{star}": bindparam(f"b_stars_{star}") for star in STARS},
+            ),
+            [
+                {
+                    "b_salon_id": row["salon_id"],
+                    "b_reviews_count": row["reviews_count"],
+                    "b_rating_sum": row["rating_sum"],
+                    "b_rating": row["rating"],
+                    **{f"b_stars_{star}": row[f"stars_{star}"] for star in STARS},
+                }
+                for row in rows
+            ],
+        )
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from data_version import SALONS, bump_version
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        count = recompute_salon_ratings(db.connection())
+        bump_version(db, SALONS)
+        db.commit()
+        print(f"✅ Рейтинги пересчитаны для {count} салонов")
+    finally:
+        db.close()
@@ -0,0 +1,180 @@
+# response_cache.py - кэш готовых HTML-страниц с ETag и ответом 304
+import asyncio
+import hashlib
+import re
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+
+from cache_backend import CacheBackend
+from data_version import BLOG, SALONS, get_versions
+from database import ReadSessionLocal
+
+# Кэшируемые страницы: шаблон пути, время жизни (сек.), от каких данных зависят
+ROUTES = (
+    (re.compile(r"^/$"), 30.0, (SALONS, BLOG)),
+    (re.compile(r"^/catalog$"), 60.0, (SALONS,)),
+    (re.compile(r"^/catalog/\d+$"), 120.0, (SALONS,)),
+    (re.compile(r"^/blog$"), 60.0, (BLOG,)),
+    (re.compile(r"^/blog/[^/]+$"), 120.0, (BLOG,)),
+)
+
+# Обработчик может положить сюда (имя, аргумент) - при каждой выдаче страницы
+# из кэша вызывается зарегистрированная под этим именем функция
+# (например, чтобы засчитать просмотр статьи)
+ON_HIT_STATE = "response_cache_on_hit"
+
+_hit_handlers: Dict[str, Callable] = {}
+
+
+def register_hit_handler(name: str, handler: Callable):
+    _hit_handlers[name] = handler
+
+
+class CachedResponse:
+    __slots__ = ("status", "headers", "body", "etag", "on_hit")
+
+    def __init__(self, status, headers, body, etag, on_hit):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.on_hit = on_hit
+
+    # pickle для общих хранилищ (sqlite, redis)
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def cache_key(path: str, query_string: bytes, versions: tuple) -> str:
+    # Порядок и пустые параметры не влияют на ключ; смена версии данных - новый ключ
+    params = sorted(
+        (name, value)
+        for name, value in parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+        if value != ""
+    )
+    version = ".".join(str(value) for value in versions)
+    return f"page:{version}:{path}?{urlencode(params)}"
+
+
+def _match_route(path: str):
+    for pattern, ttl, scopes in ROUTES:
+        if pattern.match(path):
+            return ttl, scopes
+    return None
+
+
+def _current_versions(scopes) -> tuple:
+    db = ReadSessionLocal()
+    try:
+        return get_versions(db, *scopes)
+    finally:
+        db.close()
+
+
+class ResponseCacheMiddleware:
+    """ASGI-middleware: отдает страницу из кэша без запросов к данным и рендеринга"""
+
+    def __init__(self, app, cache: CacheBackend):
+        self.app = app
+        self.cache = cache
+
+    def _lookup(self, scope, scopes):
+        # Запрос версий и чтение из хранилища (файл SQLite, сокет Redis) блокируют -
+        # выполняются в пуле потоков, а не в цикле событий
+        key = cache_key(scope["path"], scope.get("query_string", b""), _current_versions(scopes))
+        return key, self.cache.safe_get(key)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        route = _match_route(scope["path"])
+        request_headers = Headers(scope=scope)
+        if route is None or "authorization" in request_headers:
+            await self.app(scope, receive, send)
+            return
+
+        ttl, scopes = route
+        key, entry = await asyncio.to_thread(self._lookup, scope, scopes)
+        if_none_match = request_headers.get("if-none-match")
+        if entry is not None:
+            if entry.on_hit is not None:
+                name, argument = entry.on_hit
+                _hit_handlers[name](argument)
+            await self._send_entry(send, entry, if_none_match, "HIT", scope["method"] == "HEAD")
+            return
+        if scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        # Промах: выполняем обработчик и запоминаем ответ целиком
+        state = scope.setdefault("state", {})
+        start_message = {}
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start_message.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, capture)
+
+        body = b"".join(chunks)
+        headers = [
+            (name, value)
+            for name, value in start_message.get("headers", [])
+            if name.lower() not in (b"content-length", b"etag", b"cache-control")
+        ]
+        content_type = dict(headers).get(b"content-type", b"")
+        etag = make_etag(body)
+        entry = CachedResponse(
+            status=start_message.get("status", 200),
+            headers=headers,
+            body=body,
+            etag=etag,
+            on_hit=state.get(ON_HIT_STATE),
+        )
+        if entry.status == 200 and content_type.startswith(b"text/html"):
+            await asyncio.to_thread(self.cache.safe_set, key, entry, ttl)
+            await self._send_entry(send, entry, if_none_match, "MISS", False)
+            return
+
+        # Ошибки и не-HTML ответы отдаем как есть
+        await send({**start_message, "headers": start_message.get("headers", [])})
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _send_entry(send: Callable, entry: CachedResponse, if_none_match, status: str, head: bool):
+        common = [
+            (b"etag", entry.etag.encode("latin-1")),
+            (b"cache-control", b"no-cache"),
+            (b"x-cache", status.encode("latin-1")),
+        ]
+        if etag_matches(if_none_match, entry.etag):
+            # Браузер уже хранит эту версию страницы
+            await send({"type": "http.response.start", "status": 304, "headers": common})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        headers = entry.headers + common + [(b"content-length", str(len(entry.body)).encode("latin-1"))]
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if head else entry.body})
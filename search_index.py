@@ -0,0 +1,237 @@
+# search_index.py - полнотекстовый поиск по салонам и статьям блога:
+# SQLite - FTS5, PostgreSQL - tsvector с GIN-индексом, иначе - ILIKE
+import re
+from typing import List, Optional
+
+from sqlalchemy import Text, column, func, literal_column, or_, select, table
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+import config
+import models
+
+# unicode61 приводит кириллицу к нижнему регистру и убирает диакритику (ё -> е)
+TOKENIZE = "unicode61 remove_diacritics 2"
+
+INDEXES = {
+    "salons_fts": ("salons", ("name", "description", "address", "district", "category")),
+    "blog_posts_fts": ("blog_posts", ("title", "excerpt", "content")),
+}
+
+salons_fts = table("salons_fts", column("rowid"), column("rank"))
+blog_posts_fts = table("blog_posts_fts", column("rowid"), column("rank"))
+
+# Чем ищет текущая база: "fts5", "tsvector" или None (ILIKE)
+_backend: Optional[str] = None
+
+
+def _update_trigger_ddl(name: str, source: str, columns) -> str:
+    # Только при изменении индексируемых колонок: сброс просмотров статей и
+    # пересчет рейтингов салонов не переписывают индекс
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS {name}_au AFTER UPDATE OF {cols} ON {source} BEGIN "
+        f"INSERT INTO {name}({name}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {name}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+    )
+
+
+def _index_ddl(name: str, source: str, columns) -> List[str]:
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{c}" for c in columns)
+    old_values = ", ".join(f"old.{c}" for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {name} USING fts5("
+        f"{cols}, content='{source}', content_rowid='id', tokenize='{TOKENIZE}')",
+        # Триггеры держат индекс в синхронизации с таблицей
+        f"CREATE TRIGGER IF NOT EXISTS {name}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {name}(rowid, {cols}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {name}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {name}({name}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END",
+        _update_trigger_ddl(name, source, columns),
+    ]
+
+
+def _document(columns):
+    """tsvector по колонкам; только литералы без параметров - иначе выражение
+    запроса не совпадет с выражением индекса"""
+    text = None
+    for col in columns:
+        part = func.coalesce(col, literal_column("''"))
+        text = part if text is None else text + literal_column("' '") + part
+    return func.to_tsvector(literal_column(f"'{config.POSTGRES_SEARCH_CONFIG}'"), text)
+
+
+def _source_document(name: str):
+    source, columns = INDEXES[name]
+    source_table = models.Base.metadata.tables[source]
+    return _document([source_table.c[col] for col in columns])
+
+
+def _tsvector_index_ddl(connection: Connection, name: str, source: str, columns) -> str:
+    expression = _document([column(col, Text) for col in columns]).compile(
+        dialect=connection.dialect, compile_kwargs={"literal_binds": True}
+    )
+    return f"CREATE INDEX IF NOT EXISTS ix_{name} ON {source} USING gin ({expression})"
+
+
+def ensure_search_index(engine: Engine) -> bool:
+    """Создает полнотекстовые индексы (FTS5 с триггерами или GIN); при первом создании
+    FTS5 заполняет их. False - поиск остается на ILIKE"""
+    global _backend
+    if engine.dialect.name == "postgresql":
+        # GIN-индекс по выражению PostgreSQL обновляет сам
+        with engine.begin() as connection:
+            for name, (source, columns) in INDEXES.items():
+                connection.exec_driver_sql(_tsvector_index_ddl(connection, name, source, columns))
+        _backend = "tsvector"
+        return True
+
+    if engine.dialect.name != "sqlite":
+        return False
+
+    with engine.begin() as connection:
+        options = connection.exec_driver_sql("PRAGMA compile_options").scalars().all()
+        if "ENABLE_FTS5" not in options:
+            return False
+
+        for name, (source, columns) in INDEXES.items():
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+            ).first()
+            for statement in _index_ddl(name, source, columns):
+                connection.exec_driver_sql(statement)
+            if not exists:
+                connection.exec_driver_sql(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+
+    _backend = "fts5"
+    return True
+
+
+def detect_search_index(engine: Engine) -> bool:
+    """Запоминает, чем искать, по уже созданным индексам - без DDL (воркеры
+    приложения; создает индексы ensure_search_index)"""
+    global _backend
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            found = connection.exec_driver_sql(
+                "SELECT 1 FROM pg_indexes WHERE indexname = 'ix_salons_fts'"
+            ).first()
+            backend = "tsvector"
+        elif engine.dialect.name == "sqlite":
+            found = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'salons_fts'"
+            ).first()
+            backend = "fts5"
+        else:
+            found = None
+    _backend = backend if found else None
+    return _backend is not None
+
+
+def recreate_update_triggers(connection: Connection):
+    """Пересоздает триггеры обновления FTS5 (CREATE TRIGGER IF NOT EXISTS не
+    заменяет уже существующие)"""
+    if connection.dialect.name != "sqlite":
+        return
+    for name, (source, columns) in INDEXES.items():
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).first()
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}_au")
+        if exists:
+            connection.exec_driver_sql(_update_trigger_ddl(name, source, columns))
+
+
+def drop_search_index(connection: Connection):
+    """Снимает поддержку индексов на время массовой загрузки; возвращает ensure_search_index"""
+    for name in INDEXES:
+        if connection.dialect.name == "sqlite":
+            for suffix in ("ai", "ad", "au"):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}_{suffix}")
+        elif connection.dialect.name == "postgresql":
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{name}")
+
+
+def rebuild_search_index(engine: Engine):
+    """Полная перестройка индексов FTS5 (после массовой загрузки данных)"""
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        for name in INDEXES:
+            connection.exec_driver_sql(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+
+
+def build_match_query(search: str) -> Optional[str]:
+    # Каждое слово - префиксный терм, все термы обязательны
+    tokens = re.findall(r"\w+", search.lower())
+    if not tokens:
+        return None
+    if _backend == "tsvector":
+        return " & ".join(f"{token}:*" for token in tokens)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _ranked(query, name: str, fts_table, key, match: str):
+    """Совпадения полнотекстового индекса name, лучшие первыми"""
+    if _backend == "tsvector":
+        document = _source_document(name)
+        tsquery = func.to_tsquery(literal_column(f"'{config.POSTGRES_SEARCH_CONFIG}'"), match)
+        return query.filter(document.op("@@")(tsquery)).order_by(func.ts_rank(document, tsquery).desc())
+    return query.join(
+        fts_table, fts_table.c.rowid == key
+    ).filter(
+        literal_column(name).op("MATCH")(match)
+    ).order_by(fts_table.c.rank)
+
+
+def apply_salon_search(query, search: str):
+    """Фильтр салонов (Query или select) по поисковой строке, лучшие совпадения первыми"""
+    match = build_match_query(search)
+    if match and _backend:
+        return _ranked(query, "salons_fts", salons_fts, models.Salon.id, match)
+
+    # Запасной вариант без полнотекстового индекса: ILIKE в PostgreSQL,
+    # lower() LIKE lower() в SQLite
+    search_term = f"%{search}%"
+    return query.filter(
+        or_(
+            models.Salon.name.ilike(search_term),
+            models.Salon.description.ilike(search_term),
+            models.Salon.address.ilike(search_term),
+            models.Salon.district.ilike(search_term),
+            models.Salon.category.ilike(search_term),
+        )
+    )
+
+
+def apply_blog_search(query, search: str):
+    """Фильтр статей (Query или select) по поисковой строке, лучшие совпадения первыми"""
+    match = build_match_query(search)
+    if match and _backend:
+        return _ranked(query, "blog_posts_fts", blog_posts_fts, models.BlogPost.id, match)
+
+    search_term = f"%{search}%"
+    return query.filter(
+        models.BlogPost.title.ilike(search_term) |
+        models.BlogPost.content.ilike(search_term) |
+        models.BlogPost.excerpt.ilike(search_term)
+    )
+
+
+def search_salon_ids(db: Session, search: str) -> Optional[List[int]]:
+    """id найденных салонов по релевантности; None без полнотекстового индекса"""
+    match = build_match_query(search)
+    if not match or not _backend:
+        return None
+    if _backend == "tsvector":
+        statement = _ranked(select(models.Salon.id), "salons_fts", salons_fts, models.Salon.id, match)
+        return db.execute(statement).scalars().all()
+    # Только таблица FTS5 - без обращения к salons
+    return db.execute(
+        select(salons_fts.c.rowid).where(
+            literal_column("salons_fts").op("MATCH")(match)
+        ).order_by(salons_fts.c.rank)
+    ).scalars().all()
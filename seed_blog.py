@@ -3,8 +3,10 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import SessionLocal
+from database import SessionLocal, engine
 import models
+import data_version  # noqa: F401 - увеличивает версии данных при записи
+import similar_posts  # noqa: F401 - обновляет индекс похожих статей после commit
 from datetime import datetime, timedelta
 import random
 import re
@@ -45,6 +47,7 @@ def create_slug(text):
     return result
 
 def seed_blog():
+    models.Base.metadata.create_all(bind=engine)
     db = SessionLocal()
     
     try:
@@ -577,6 +580,7 @@ def seed_blog():
         print("📝 Создаем статьи блога (20 статей)...")
         base_date = datetime(2026, 12, 15)
         
+        post_tag_links = set()
         for i, post_data in enumerate(posts_data):
             slug = create_slug(post_data["title"])
             
@@ -603,25 +607,17 @@ def seed_blog():
             db.add(post)
             db.flush()  # Получаем ID поста
             
-            # Добавляем теги
-            tag_names = post_data.get("tags", [])
-            for tag_name in tag_names:
+            # Связи с тегами - без повторов, вставляются одним executemany
+            for tag_name in post_data.get("tags", []):
                 tag = tags_dict.get(tag_name)
                 if tag:
-                    # Проверяем, не добавлен ли уже этот тег
-                    existing_link = db.execute(
-                        models.post_tags.select().where(
-                            models.post_tags.c.post_id == post.id,
-                            models.post_tags.c.tag_id == tag.id
-                        )
-                    ).first()
-                    
-                    if not existing_link:
-                        stmt = models.post_tags.insert().values(
-                            post_id=post.id,
-                            tag_id=tag.id
-                        )
-                        db.execute(stmt)
+                    post_tag_links.add((post.id, tag.id))
+        
+        if post_tag_links:
+            db.execute(
+                models.post_tags.insert(),
+                [{"post_id": post_id, "tag_id": tag_id} for post_id, tag_id in sorted(post_tag_links)]
+            )
         
         db.commit()
         
@@ -672,11 +668,11 @@ def seed_blog():
         comment_count = db.query(models.BlogComment).count()
         
         # Подсчет тегов по статьям
-        from sqlalchemy import func
+        from sqlalchemy import desc, func
         tags_stats = db.query(
             models.BlogTag.name,
             func.count(models.post_tags.c.post_id).label('count')
-        ).join(models.post_tags).group_by(models.BlogTag.name).order_by(func.desc('count')).limit(10).all()
+        ).join(models.post_tags).group_by(models.BlogTag.name).order_by(desc('count')).limit(10).all()
         
         print("\n" + "="*50)
         print("✅ База данных успешно заполнена!")
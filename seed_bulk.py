@@ -0,0 +1,368 @@
+# seed_bulk.py - массовая генерация данных для нагрузочного тестирования
+#
+# python seed_bulk.py --scale 1      # 1 000 салонов, ~100 000 отзывов, 500 статей
+# python seed_bulk.py --scale 100    # 100 000 салонов, ~10 000 000 отзывов, 50 000 статей
+#
+# Вставка идет через Core executemany большими пачками в одной транзакции на таблицу,
+# с отключенными на время загрузки вторичными индексами и FTS-триггерами.
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.engine import Connection
+
+import models
+from database import SQLALCHEMY_DATABASE_URL, SessionLocal, engine
+from data_version import BLOG, SALONS, bump_version
+from migrations import create_missing_indexes, upgrade
+from ratings import recompute_salon_ratings
+from search_index import drop_search_index, ensure_search_index, rebuild_search_index
+from seed_blog import create_slug
+from seed_salons import (
+    DESCRIPTIONS, DISTRICTS, LENINSKY_STREETS, OKTYABRSKY_STREETS, REVIEW_AUTHORS,
+    REVIEW_TAGS, REVIEW_TEXTS, SALON_CATEGORIES, SALON_NAMES, SERVICES_BY_CATEGORY,
+)
+from similar_posts import rebuild_similar_posts
+
+# Объемы при --scale 1
+SALONS_PER_SCALE = 1000
+REVIEWS_PER_SALON = 100
+POSTS_PER_SCALE = 500
+COMMENTS_PER_POST = 4
+
+# Изображения салонов из static/img (файла 10.jpg нет)
+SALON_IMAGES = tuple(f"/static/img/{number}.jpg" for number in range(1, 20) if number != 10)
+
+# Полный пересчет похожих статей - O(n^2), для больших объемов запускается отдельно
+SIMILAR_POSTS_LIMIT = 5000
+
+BLOG_CATEGORIES = [
+    "Советы", "Тренды", "Уход за волосами", "Брови и ресницы", "Маникюр", "Косметология",
+    "Мужской уход", "Педикюр", "SPA-процедуры", "Питание и красота", "Домашний уход",
+    "Профессиональная косметика",
+]
+
+BLOG_TAGS = [
+    "стрижка", "окрашивание", "маникюр", "уход за кожей", "брови", "тренды", "советы",
+    "мужской уход", "ламинирование", "укладка", "педикюр", "косметология", "волосы",
+    "пилинг", "маски", "сыворотки", "увлажнение", "массаж", "депиляция", "шугаринг",
+    "ароматерапия", "детокс", "витамины", "барбер", "кератин", "SPF", "домашний уход",
+]
+
+TITLE_STARTS = ["Как выбрать", "Все о процедуре", "Тренды сезона:", "Секреты ухода:", "Гид по теме", "Ошибки, которых стоит избегать:"]
+TITLE_TOPICS = [
+    "окрашивание волос", "уход за кожей зимой", "маникюр с гель-лаком", "ламинирование бровей",
+    "мужскую стрижку", "SPA-программы", "пилинг лица", "кератиновое выпрямление", "массаж лица",
+    "педикюр дома", "шугаринг", "профессиональную косметику",
+]
+PARAGRAPHS = [
+    "Регулярный уход помогает сохранить результат процедуры надолго и избежать лишних затрат.",
+    "Перед записью стоит уточнить у мастера, какие материалы используются и как подготовиться.",
+    "Профессиональные средства отличаются концентрацией активных компонентов и стойкостью.",
+    "Домашний уход дополняет салонные процедуры, но не заменяет их полностью.",
+    "Выбирайте салон по отзывам, сертификатам мастеров и чистоте рабочего места.",
+    "Сезонные изменения влияют на состояние кожи и волос - уход нужно корректировать.",
+    "Консультация специалиста поможет подобрать процедуру под ваш тип кожи и волос.",
+]
+
+# Режим журнала не меняется: база остается в WAL (см. database.py), а выход
+# из WAL потребовал бы монопольного доступа к файлу
+SQLITE_BULK_PRAGMAS = (
+    "PRAGMA synchronous=OFF",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-262144",
+)
+
+
+def create_bulk_engine():
+    """Отдельный движок для загрузки: PRAGMA на скорость вместо надежности"""
+    bulk_engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    if bulk_engine.dialect.name == "sqlite":
+        @event.listens_for(bulk_engine, "connect")
+        def _bulk_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in SQLITE_BULK_PRAGMAS:
+                cursor.execute(pragma)
+            cursor.close()
+    return bulk_engine
+
+
+def batched(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def insert_rows(connection: Connection, table, rows: Iterable[dict], batch_size: int) -> int:
+    total = 0
+    for batch in batched(rows, batch_size):
+        connection.execute(table.insert(), batch)
+        total += len(batch)
+    return total
+
+
+def next_id(connection: Connection, table) -> int:
+    return (connection.execute(select(func.max(table.c.id))).scalar() or 0) + 1
+
+
+def _random_date(days: int) -> datetime:
+    return datetime.now() - timedelta(days=random.randint(0, days), seconds=random.randint(0, 86399))
+
+
+# --- Салоны, услуги, отзывы ---
+
+def salon_rows(first_id: int, count: int) -> Iterator[dict]:
+    for salon_id in range(first_id, first_id + count):
+        district = DISTRICTS[salon_id % len(DISTRICTS)]
+        streets = LENINSKY_STREETS if district == "Ленинский" else OKTYABRSKY_STREETS
+        yield {
+            "id": salon_id,
+            "name": f"{random.choice(SALON_NAMES)} - {district} #{salon_id}",
+            "category": random.choice(SALON_CATEGORIES),
+            "description": random.choice(DESCRIPTIONS),
+            "address": f"{random.choice(streets)}, {random.randint(1, 150)}",
+            "district": district,
+            "phone": f"+7{random.randint(900, 999)}{random.randint(1000000, 9999999)}",
+            "working_hours": "Пн-Пт 09:00-21:00, Сб-Вс 10:00-18:00",
+            "rating": 0.0,
+            "reviews_count": 0,
+            "is_verified": random.random() < 0.33,
+            "image_url": SALON_IMAGES[salon_id % len(SALON_IMAGES)],
+            "created_at": _random_date(365 * 3),
+        }
+
+
+def service_rows(connection: Connection, first_salon_id: int) -> Iterator[dict]:
+    salons = models.Salon.__table__
+    all_services = [service for services in SERVICES_BY_CATEGORY.values() for service in services]
+    for salon_id, category in connection.execute(
+        select(salons.c.id, salons.c.category).where(salons.c.id >= first_salon_id)
+    ).all():
+        choices = SERVICES_BY_CATEGORY.get(category, all_services)
+        for service in random.sample(choices, min(len(choices), random.randint(4, 8))):
+            yield {
+                "salon_id": salon_id,
+                "category": service["category"],
+                "name": service["name"],
+                "description": f"Качественное выполнение услуги '{service['name']}'",
+                "price": service["price"] + random.randint(-200, 200),
+            }
+
+
+def review_rows(first_salon_id: int, salon_count: int, per_salon: int) -> Iterator[dict]:
+    for salon_id in range(first_salon_id, first_salon_id + salon_count):
+        good = random.random() < 0.5
+        weights = [0.05, 0.1, 0.2, 0.3, 0.35] if good else [0.1, 0.2, 0.3, 0.25, 0.15]
+        count = random.randint(per_salon // 2, per_salon * 3 // 2)
+        for rating in random.choices([1, 2, 3, 4, 5], weights=weights, k=count):
+            yield {
+                "salon_id": salon_id,
+                "author_name": random.choice(REVIEW_AUTHORS),
+                "rating": rating,
+                "text": random.choice(REVIEW_TEXTS),
+                "tags": ", ".join(random.sample(REVIEW_TAGS, 2)),
+                "created_at": _random_date(365),
+            }
+
+
+# --- Блог ---
+
+def post_rows(first_id: int, count: int) -> Iterator[dict]:
+    for post_id in range(first_id, first_id + count):
+        title = f"{random.choice(TITLE_STARTS)} {random.choice(TITLE_TOPICS)}"
+        paragraphs = random.sample(PARAGRAPHS, 4)
+        yield {
+            "id": post_id,
+            "title": title,
+            "slug": f"{create_slug(title)}-{post_id}",
+            "excerpt": paragraphs[0],
+            "content": "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs),
+            "author": "Администратор",
+            "image_url": "/static/img/default.png",
+            "category": random.choice(BLOG_CATEGORIES),
+            "is_published": random.random() < 0.95,
+            "views_count": random.randint(0, 5000),
+            "created_at": _random_date(365 * 2),
+            "updated_at": datetime.now(),
+        }
+
+
+def ensure_taxonomy(connection: Connection) -> List[int]:
+    """Категории и теги блога (создаются недостающие); возвращает id тегов"""
+    categories = models.BlogCategory.__table__
+    tags = models.BlogTag.__table__
+    existing = set(connection.execute(select(categories.c.name)).scalars())
+    missing = [name for name in BLOG_CATEGORIES if name not in existing]
+    if missing:
+        connection.execute(categories.insert(), [{"name": name, "slug": create_slug(name)} for name in missing])
+
+    existing = set(connection.execute(select(tags.c.name)).scalars())
+    missing = [name for name in BLOG_TAGS if name not in existing]
+    if missing:
+        connection.execute(tags.insert(), [{"name": name, "slug": create_slug(name)} for name in missing])
+    return list(connection.execute(select(tags.c.id)).scalars())
+
+
+def post_tag_rows(first_id: int, count: int, tag_ids: List[int]) -> Iterator[dict]:
+    for post_id in range(first_id, first_id + count):
+        for tag_id in random.sample(tag_ids, min(len(tag_ids), random.randint(2, 5))):
+            yield {"post_id": post_id, "tag_id": tag_id}
+
+
+def comment_rows(first_id: int, count: int, per_post: int) -> Iterator[dict]:
+    for post_id in range(first_id, first_id + count):
+        for _ in range(random.randint(0, per_post * 2)):
+            yield {
+                "post_id": post_id,
+                "author_name": random.choice(REVIEW_AUTHORS),
+                "author_email": None,
+                "content": random.choice(REVIEW_TEXTS),
+                "is_approved": True,
+                "created_at": _random_date(365),
+            }
+
+
+# --- Загрузка ---
+
+BULK_TABLES = ("salons", "services", "reviews", "blog_posts", "post_tags", "blog_comments")
+
+
+def drop_secondary_indexes(connection: Connection):
+    """Индексы и поддержка полнотекстового поиска снимаются на время загрузки и создаются заново после"""
+    for table in models.Base.metadata.sorted_tables:
+        if table.name in BULK_TABLES:
+            for index in table.indexes:
+                connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index.name}")
+    drop_search_index(connection)
+
+
+def clear_data(connection: Connection):
+    for table in ("post_tags", "blog_comments", "similar_posts", "blog_posts", "reviews", "services", "salons"):
+        connection.exec_driver_sql(f"DELETE FROM {table}")
+
+
+def sync_sequences(connection: Connection):
+    """PostgreSQL: id салонов и статей заданы явно - счетчики serial сдвигаются за максимум"""
+    if connection.dialect.name != "postgresql":
+        return
+    for table in (models.Salon.__table__, models.BlogPost.__table__):
+        connection.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE((SELECT MAX(id) FROM {table.name}), 0) + 1, false)"
+        )
+
+
+def seed_bulk(scale: float, batch_size: int = 10000, append: bool = False, similar: Optional[bool] = None):
+    upgrade(engine)
+    engine.dispose()
+    salons_count = max(1, int(SALONS_PER_SCALE * scale))
+    posts_count = max(1, int(POSTS_PER_SCALE * scale))
+    bulk_engine = create_bulk_engine()
+    started = time.perf_counter()
+
+    def step(message: str):
+        print(f"  [{time.perf_counter() - started:8.1f} с] {message}")
+
+    print(f"🔄 Массовая загрузка: scale={scale}, салонов {salons_count}, статей {posts_count}")
+    try:
+        with bulk_engine.begin() as connection:
+            drop_secondary_indexes(connection)
+            if not append:
+                clear_data(connection)
+                step("старые данные удалены")
+
+        with bulk_engine.begin() as connection:
+            first_salon = next_id(connection, models.Salon.__table__)
+            total = insert_rows(
+                connection, models.Salon.__table__, salon_rows(first_salon, salons_count), batch_size
+            )
+            step(f"салоны: {total}")
+            total = insert_rows(
+                connection, models.Service.__table__, service_rows(connection, first_salon), batch_size
+            )
+            step(f"услуги: {total}")
+
+        with bulk_engine.begin() as connection:
+            total = insert_rows(
+                connection, models.Review.__table__,
+                review_rows(first_salon, salons_count, REVIEWS_PER_SALON), batch_size,
+            )
+            step(f"отзывы: {total}")
+
+        with bulk_engine.begin() as connection:
+            tag_ids = ensure_taxonomy(connection)
+            first_post = next_id(connection, models.BlogPost.__table__)
+            total = insert_rows(
+                connection, models.BlogPost.__table__, post_rows(first_post, posts_count), batch_size
+            )
+            step(f"статьи: {total}")
+            total = insert_rows(
+                connection, models.post_tags, post_tag_rows(first_post, posts_count, tag_ids), batch_size
+            )
+            step(f"связи статья-тег: {total}")
+            total = insert_rows(
+                connection, models.BlogComment.__table__,
+                comment_rows(first_post, posts_count, COMMENTS_PER_POST), batch_size,
+            )
+            step(f"комментарии: {total}")
+            sync_sequences(connection)
+
+        # Производные данные - по одному разу после загрузки
+        with bulk_engine.begin() as connection:
+            recompute_salon_ratings(connection)
+            step("агрегаты рейтингов пересчитаны")
+    finally:
+        # Индексы и FTS-триггеры возвращаются и при ошибке загрузки
+        with bulk_engine.begin() as connection:
+            create_missing_indexes(connection)
+            step("индексы созданы, ANALYZE выполнен")
+        if ensure_search_index(bulk_engine):
+            rebuild_search_index(bulk_engine)
+            step("полнотекстовый индекс перестроен")
+
+    if similar is None:
+        similar = posts_count <= SIMILAR_POSTS_LIMIT
+    if similar:
+        with bulk_engine.begin() as connection:
+            rebuild_similar_posts(connection)
+        step("похожие статьи пересчитаны")
+    else:
+        print("  ⚠️ Похожие статьи не пересчитаны - запустите отдельно: python similar_posts.py")
+
+    db = SessionLocal()
+    try:
+        bump_version(db, SALONS, BLOG)
+        db.commit()
+    finally:
+        db.close()
+    if bulk_engine.dialect.name == "sqlite":
+        # Загруженные страницы переносятся из WAL в файл базы, журнал усекается
+        with bulk_engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+    bulk_engine.dispose()
+    print(f"✅ Готово за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Массовая генерация данных для нагрузочного тестирования")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help=f"множитель объема: {SALONS_PER_SCALE} салонов и {POSTS_PER_SCALE} статей на единицу")
+    parser.add_argument("--batch-size", type=int, default=10000, help="строк в одном executemany")
+    parser.add_argument("--append", action="store_true", help="добавить к существующим данным, не очищая таблицы")
+    parser.add_argument("--similar", action=argparse.BooleanOptionalAction, default=None,
+                        help=f"пересчитать похожие статьи (по умолчанию - если статей не больше {SIMILAR_POSTS_LIMIT})")
+    args = parser.parse_args()
+    seed_bulk(args.scale, args.batch_size, args.append, args.similar)
@@ -11,10 +11,13 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from models import Base, Salon, Service, Review
 from database import SQLALCHEMY_DATABASE_URL
+import data_version  # noqa: F401 - увеличивает версии данных при записи
+from ratings import recompute_salon_ratings
 
 # Создаем подключение к базе данных
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
 
 # Данные для генерации - только Ленинский и Октябрьский районы
 SALON_NAMES = [
@@ -264,8 +267,9 @@ def create_services(db, salon):
             )
             db.add(service)
 
-def create_reviews(db, salon):
-    """Создает отзывы для салона"""
+def create_reviews(salon):
+    """Строки отзывов для салона (вставляются пачкой, см. seed_salons)"""
+    reviews = []
     num_reviews = random.randint(salon.reviews_count // 2, salon.reviews_count)
     
     for _ in range(num_reviews):
@@ -283,15 +287,16 @@ def create_reviews(db, salon):
         else:
             text = "Есть над чем поработать. Не все понравилось."  # Отрицательные
         
-        review = Review(
-            salon_id=salon.id,
-            author_name=random.choice(REVIEW_AUTHORS),
-            rating=rating,
-            text=text,
-            tags=", ".join(random.sample(REVIEW_TAGS, random.randint(2, 4))),
-            created_at=datetime.now() - timedelta(days=random.randint(0, 365))
-        )
-        db.add(review)
+        reviews.append({
+            "salon_id": salon.id,
+            "author_name": random.choice(REVIEW_AUTHORS),
+            "rating": rating,
+            "text": text,
+            "tags": ", ".join(random.sample(REVIEW_TAGS, random.randint(2, 4))),
+            "created_at": datetime.now() - timedelta(days=random.randint(0, 365))
+        })
+    
+    return reviews
 
 def seed_salons():
     """Основная функция заполнения базы данных"""
@@ -341,9 +346,17 @@ def seed_salons():
         db.commit()
         
         print("⭐ Создаем отзывы для салонов...")
+        # Один executemany вместо ORM-вставки по строке; агрегаты салонов
+        # пересчитываются ниже одним запросом
+        review_rows = []
         for salon in salons:
-            create_reviews(db, salon)
+            review_rows.extend(create_reviews(salon))
+        db.execute(Review.__table__.insert(), review_rows)
+        
+        db.commit()
         
+        # Рейтинг и число отзывов салона - по фактическим отзывам
+        recompute_salon_ratings(db.connection())
         db.commit()
         
         # Статистика
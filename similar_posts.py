@@ -0,0 +1,278 @@
+# similar_posts.py - индекс похожих статей блога (общие теги, категория, TF-IDF текста)
+# Полная перестройка: python similar_posts.py
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+import models
+
+TOP_K = 6
+
+# Вклад признаков в итоговую оценку похожести
+TAG_WEIGHT = 0.5
+CATEGORY_WEIGHT = 0.2
+TEXT_WEIGHT = 0.3
+
+MIN_TOKEN_LENGTH = 3
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+
+
+class PostFeatures:
+    __slots__ = ("id", "category", "tags", "vector")
+
+    def __init__(self, post_id: int, category: Optional[str], tags: Set[int], vector: Dict[str, float]):
+        self.id = post_id
+        self.category = category
+        self.tags = tags
+        self.vector = vector
+
+
+def _tokens(text: str) -> List[str]:
+    text = _HTML_TAG.sub(" ", text or "").casefold().replace("ё", "е")
+    return [token for token in re.findall(r"\w+", text) if len(token) >= MIN_TOKEN_LENGTH and not token.isdigit()]
+
+
+def _vector(counts: Counter, document_frequency: Counter, total: int) -> Dict[str, float]:
+    length = sum(counts.values()) or 1
+    vector = {
+        term: (count / length) * (math.log((total + 1) / (document_frequency[term] + 1)) + 1)
+        for term, count in counts.items()
+    }
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {term: weight / norm for term, weight in vector.items()}
+
+
+class FeatureCache:
+    """Признаки статей в памяти процесса между пересчетами
+
+    Текст токенизируется заново только у новых и измененных статей (по updated_at
+    и списку измененных); остальные берут частоты и вектор из кэша. IDF векторов
+    из кэша не пересчитывается при каждом изменении - точный пересчет всех статей
+    делает полная перестройка (python similar_posts.py).
+    """
+
+    TEXT_BATCH = 500
+
+    def __init__(self):
+        self.term_counts: Dict[int, Counter] = {}
+        self.vectors: Dict[int, Dict[str, float]] = {}
+        self.stamps: Dict[int, object] = {}
+        self.document_frequency: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        with self._lock:
+            self.term_counts.clear()
+            self.vectors.clear()
+            self.stamps.clear()
+            self.document_frequency.clear()
+
+    def _forget(self, post_id: int):
+        counts = self.term_counts.pop(post_id, None)
+        if counts:
+            self.document_frequency.subtract(counts.keys())
+            for term in counts:
+                if self.document_frequency[term] <= 0:
+                    del self.document_frequency[term]
+        self.vectors.pop(post_id, None)
+        self.stamps.pop(post_id, None)
+
+    def refresh(self, connection: Connection, changed: Iterable[int] = ()) -> Dict[int, "PostFeatures"]:
+        """Признаки всех опубликованных статей; текст читается только у устаревших"""
+        posts = models.BlogPost.__table__
+        changed = set(changed)
+        with self._lock:
+            rows = connection.execute(
+                select(posts.c.id, posts.c.category, posts.c.updated_at).where(posts.c.is_published == True)
+            ).all()
+            published = {row.id: row for row in rows}
+
+            tags: Dict[int, Set[int]] = defaultdict(set)
+            for post_id, tag_id in connection.execute(
+                select(models.post_tags.c.post_id, models.post_tags.c.tag_id)
+            ):
+                tags[post_id].add(tag_id)
+
+            for post_id in set(self.term_counts) - set(published):
+                self._forget(post_id)
+            stale = [
+                post_id for post_id, row in published.items()
+                if post_id in changed or post_id not in self.term_counts or self.stamps.get(post_id) != row.updated_at
+            ]
+            for offset in range(0, len(stale), self.TEXT_BATCH):
+                batch = stale[offset : offset + self.TEXT_BATCH]
+                for row in connection.execute(
+                    select(posts.c.id, posts.c.title, posts.c.content).where(posts.c.id.in_(batch))
+                ):
+                    self._forget(row.id)
+                    counts = Counter(_tokens(f"{row.title} {row.content}"))
+                    self.term_counts[row.id] = counts
+                    self.document_frequency.update(counts.keys())
+
+            total = len(published)
+            for post_id in stale:
+                self.vectors[post_id] = _vector(self.term_counts.get(post_id, Counter()), self.document_frequency, total)
+                self.stamps[post_id] = published[post_id].updated_at
+
+            return {
+                post_id: PostFeatures(post_id, row.category, tags.get(post_id, set()), self.vectors[post_id])
+                for post_id, row in published.items()
+            }
+
+
+# Кэш процесса: в приложении его обновляет только поток-писатель
+feature_cache = FeatureCache()
+
+
+def load_features(connection: Connection) -> Dict[int, PostFeatures]:
+    """Признаки всех опубликованных статей с нуля: токены и TF-IDF по всему корпусу"""
+    return FeatureCache().refresh(connection)
+
+
+def similarity(a: PostFeatures, b: PostFeatures) -> float:
+    score = 0.0
+    if a.tags and b.tags:
+        score += TAG_WEIGHT * len(a.tags & b.tags) / len(a.tags | b.tags)
+    if a.category and a.category == b.category:
+        score += CATEGORY_WEIGHT
+    small, large = (a.vector, b.vector) if len(a.vector) <= len(b.vector) else (b.vector, a.vector)
+    score += TEXT_WEIGHT * sum(weight * large.get(term, 0.0) for term, weight in small.items())
+    return score
+
+
+def _top_neighbours(post: PostFeatures, features: Dict[int, PostFeatures]) -> List[tuple]:
+    scored = [
+        (similarity(post, other), other.id)
+        for other in features.values()
+        if other.id != post.id
+    ]
+    # При равной оценке - более новая статья (больший id)
+    scored.sort(key=lambda item: (-item[0], -item[1]))
+    return [(other_id, score) for score, other_id in scored[:TOP_K] if score > 0]
+
+
+def _write(connection: Connection, neighbours: Dict[int, List[tuple]]):
+    table = models.SimilarPost.__table__
+    if not neighbours:
+        return
+    connection.execute(delete(table).where(table.c.post_id.in_(list(neighbours))))
+    rows = [
+        {"post_id": post_id, "similar_id": other_id, "rank": rank, "score": score}
+        for post_id, items in neighbours.items()
+        for rank, (other_id, score) in enumerate(items)
+    ]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def _rank(items: List[tuple]) -> List[tuple]:
+    # Как _top_neighbours: по оценке, при равной - более новая статья (больший id)
+    items = sorted((item for item in items if item[1] > 0), key=lambda item: (-item[1], -item[0]))
+    return items[:TOP_K]
+
+
+def rebuild_similar_posts(connection: Connection, post_ids: Optional[Iterable[int]] = None) -> int:
+    """Пересчитывает топ похожих статей; возвращает число обновленных статей
+
+    Без post_ids - полная перестройка (O(N²), запускается вручную: python similar_posts.py;
+    сама выполняется при первом инкрементальном пересчете, если индекс пуст).
+    post_ids - измененные статьи: их топ считается заново, а у остальных статей
+    в готовый топ подставляются новые оценки измененных. Полностью пересчитываются
+    лишь статьи, из полного топа которых измененная статья выпала.
+    """
+    table = models.SimilarPost.__table__
+
+    if post_ids is None:
+        feature_cache.clear()
+        features = feature_cache.refresh(connection)
+        connection.execute(delete(table))
+        _write(connection, {post_id: _top_neighbours(post, features) for post_id, post in features.items()})
+        return len(features)
+
+    # Текущие топы - до удаления ушедших статей: по ним видно, где освободилось место
+    current: Dict[int, List[tuple]] = defaultdict(list)
+    for post_id, similar_id, score in connection.execute(
+        select(table.c.post_id, table.c.similar_id, table.c.score).order_by(table.c.post_id, table.c.rank)
+    ):
+        current[post_id].append((similar_id, score))
+    if not current:
+        # Индекс еще не строился (база до миграции): дополнять нечего - полная перестройка
+        return rebuild_similar_posts(connection)
+
+    changed = set(post_ids)
+    features = feature_cache.refresh(connection, changed)
+
+    # Статьи, снятые с публикации или удаленные, уходят из индекса
+    gone = changed - set(features)
+    if gone:
+        connection.execute(delete(table).where(
+            or_(table.c.post_id.in_(gone), table.c.similar_id.in_(gone))
+        ))
+
+    present = [post_id for post_id in changed if post_id in features]
+    updates = {post_id: _top_neighbours(features[post_id], features) for post_id in present}
+    for post in features.values():
+        if post.id in changed:
+            continue
+        listed = current.get(post.id, [])
+        kept = [(similar_id, score) for similar_id, score in listed if similar_id not in changed]
+        top = _rank(kept + [(other_id, similarity(post, features[other_id])) for other_id in present])
+        if len(listed) >= TOP_K and len(kept) < len(listed):
+            # Освободилось место в полном топе: за его границей могут быть статьи,
+            # которых нет в списке, - если новые оценки не выше прежней границы, считаем заново
+            threshold = listed[-1][1]
+            if len(top) < TOP_K or top[-1][1] <= threshold:
+                top = _top_neighbours(post, features)
+        if top != listed:
+            updates[post.id] = top
+
+    _write(connection, updates)
+    return len(updates)
+
+
+# Изменения статей и их тегов копятся за транзакцию и обрабатываются после commit
+_PENDING = "similar_posts_pending"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_posts(session, flush_context):
+    changed = session.info.setdefault(_PENDING, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.BlogPost) and obj.id is not None:
+            changed.add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _update_after_commit(session):
+    changed = session.info.pop(_PENDING, None)
+    if not changed:
+        return
+    from writer import write_queue
+
+    # Отдельной задачей писателя - после текущей пачки, не внутри ее commit
+    write_queue.submit(lambda write_session: rebuild_similar_posts(write_session.connection(), changed))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING, None)
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    with engine.begin() as connection:
+        count = rebuild_similar_posts(connection)
+    print(f"✅ Похожие статьи пересчитаны для {count} статей")
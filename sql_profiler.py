@@ -0,0 +1,210 @@
+# sql_profiler.py - SQL-запросы и время рендеринга каждого HTTP-запроса
+#
+# Server-Timing: db;dur=12.3;desc="5 queries", render;dur=4.1, app;dur=20.0
+# Последние запросы и самые тяжелые выражения: GET /debug/sql (при SQL_PROFILING)
+import contextvars
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+slow_query_logger = logging.getLogger("sql.slow")
+
+# Сколько самых медленных выражений хранить на запрос и сколько запросов - в истории
+SLOWEST_PER_REQUEST = 5
+HISTORY_SIZE = 200
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Текст выражения без значений: запросы, отличающиеся только параметрами, совпадают"""
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _IN_LIST.sub("(...)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+class RequestProfile:
+    __slots__ = ("method", "path", "status", "started", "duration", "queries", "db_time", "render_time", "slowest")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.status = None
+        self.started = time.time()
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.slowest: List[tuple] = []
+
+    def add_query(self, statement: str, duration: float):
+        self.queries += 1
+        self.db_time += duration
+        if len(self.slowest) < SLOWEST_PER_REQUEST or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda item: -item[0])
+            del self.slowest[SLOWEST_PER_REQUEST:]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+            f"render;dur={self.render_time * 1000:.1f}, "
+            f"app;dur={self.duration * 1000:.1f}"
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started": self.started,
+            "duration_ms": round(self.duration * 1000, 2),
+            "queries": self.queries,
+            "db_ms": round(self.db_time * 1000, 2),
+            "render_ms": round(self.render_time * 1000, 2),
+            "slowest": [
+                {"ms": round(duration * 1000, 2), "sql": normalize_sql(statement)}
+                for duration, statement in self.slowest
+            ],
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("sql_profile", default=None)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current.get()
+
+
+class ProfileHistory:
+    """Последние профили запросов и сводка по нормализованным выражениям"""
+
+    def __init__(self, size: int = HISTORY_SIZE):
+        self.requests: deque = deque(maxlen=size)
+        self.statements: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self.requests.append(profile.as_dict())
+            for duration, statement in profile.slowest:
+                # [сколько раз среди самых медленных, суммарно, максимум]
+                stats = self.statements.setdefault(normalize_sql(statement), [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += duration
+                stats[2] = max(stats[2], duration)
+            if len(self.statements) > HISTORY_SIZE * SLOWEST_PER_REQUEST:
+                self.statements.clear()
+
+    def snapshot(self, limit: int = 50) -> dict:
+        with self._lock:
+            requests = list(self.requests)[-limit:]
+            statements = sorted(self.statements.items(), key=lambda item: -item[1][1])[:limit]
+        return {
+            "requests": requests[::-1],
+            "statements": [
+                {"sql": sql, "count": count, "total_ms": round(total * 1000, 2), "max_ms": round(longest * 1000, 2)}
+                for sql, (count, total, longest) in statements
+            ],
+        }
+
+
+history = ProfileHistory()
+
+
+# Порог журнала медленных запросов (сек.); 0 - журнал отключен
+_slow_threshold = 0.0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("sql_profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["sql_profiler_start"].pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.add_query(statement, duration)
+    if _slow_threshold and duration >= _slow_threshold:
+        slow_query_logger.warning(
+            "%.1f ms%s: %s", duration * 1000,
+            f" [{profile.method} {profile.path}]" if profile is not None else "",
+            normalize_sql(statement),
+        )
+
+
+def _handle_error(context):
+    # Выражение с ошибкой не доходит до after_cursor_execute
+    starts = context.connection.info.get("sql_profiler_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: Engine, slow_query_ms: float = 0.0):
+    """Хуки курсора: время каждого выражения в профиль запроса и журнал медленных"""
+    global _slow_threshold
+    _slow_threshold = slow_query_ms / 1000
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+class ProfiledTemplate(Template):
+    """Шаблон, который засчитывает время рендеринга в профиль запроса
+    (вместе с запросами, сделанными из шаблона)"""
+
+    def render(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return super().render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            profile.render_time += time.perf_counter() - started
+
+
+class SQLProfilerMiddleware:
+    """ASGI-middleware: профиль на каждый HTTP-запрос, заголовок Server-Timing"""
+
+    def __init__(self, app, skip_prefixes=("/static", "/debug/")):
+        self.app = app
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current.set(profile)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                profile.duration = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if not profile.duration:
+                profile.duration = time.perf_counter() - started
+            history.add(profile)
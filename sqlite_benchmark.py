@@ -0,0 +1,186 @@
+# sqlite_benchmark.py - конкурентные чтение и запись SQLite: профиль по умолчанию против настроенного
+#
+# python sqlite_benchmark.py                          # 8 читателей, 2 писателя, по 10 с на профиль
+# python sqlite_benchmark.py --readers 16 --writers 4 --duration 20 --output sqlite.json
+#
+# Работает с копией site.db во временном каталоге. Читатели выполняют запросы
+# каталога, блога и страницы салона; писатели - то же, что приложение: сброс
+# просмотров статей пачкой и добавление комментариев, каждое в своей транзакции.
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import json
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from database import sqlite_pragmas
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+READ_QUERIES = (
+    "SELECT * FROM salons WHERE district = ? ORDER BY rating DESC, reviews_count DESC, id LIMIT 9",
+    "SELECT * FROM reviews WHERE salon_id = ? ORDER BY created_at DESC LIMIT 10",
+    "SELECT * FROM blog_posts WHERE is_published = 1 ORDER BY created_at DESC, id DESC LIMIT 6",
+    "SELECT * FROM blog_comments WHERE post_id = ? AND is_approved = 1 ORDER BY created_at DESC",
+)
+
+# Профиль по умолчанию - как было до настройки: журнал отката, только таймаут драйвера
+PROFILES = {
+    "default": ["PRAGMA journal_mode=DELETE"],
+    "tuned": None,  # sqlite_pragmas() из текущих настроек
+}
+
+
+def connect(path: str, pragmas: List[str]) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+    for pragma in pragmas:
+        connection.execute(pragma)
+    return connection
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def run_profile(source: str, pragmas: List[str], readers: int, writers: int, duration: float, seed: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="sqlite-bench-")
+    path = os.path.join(workdir, "site.db")
+    shutil.copyfile(source, path)
+    try:
+        # Режим журнала хранится в файле - выставляем до старта потоков
+        connect(path, pragmas).close()
+        setup = sqlite3.connect(path)
+        salon_ids = [row[0] for row in setup.execute("SELECT id FROM salons")] or [1]
+        post_ids = [row[0] for row in setup.execute("SELECT id FROM blog_posts")] or [1]
+        districts = [row[0] for row in setup.execute("SELECT DISTINCT district FROM salons")] or [""]
+        journal_mode = setup.execute("PRAGMA journal_mode").fetchone()[0]
+        setup.close()
+
+        stop = threading.Event()
+        results: Dict[str, list] = {"read_latency": [], "write_latency": []}
+        counters = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+        lock = threading.Lock()
+
+        def reader(number: int):
+            rng = random.Random(seed + number)
+            connection = connect(path, pragmas)
+            latencies = []
+            errors = 0
+            while not stop.is_set():
+                query = rng.choice(READ_QUERIES)
+                parameter = {
+                    0: (rng.choice(districts),),
+                    1: (rng.choice(salon_ids),),
+                    2: (),
+                    3: (rng.choice(post_ids),),
+                }[READ_QUERIES.index(query)]
+                started = time.perf_counter()
+                try:
+                    connection.execute(query, parameter).fetchall()
+                except sqlite3.OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                results["read_latency"].extend(latencies)
+                counters["reads"] += len(latencies)
+                counters["read_errors"] += errors
+
+        def writer(number: int):
+            rng = random.Random(seed + 1000 + number)
+            connection = connect(path, pragmas)
+            latencies = []
+            errors = 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    with connection:
+                        if rng.random() < 0.7:
+                            # Как view_counter.flush: пачка просмотров одной транзакцией
+                            connection.executemany(
+                                "UPDATE blog_posts SET views_count = views_count + ? WHERE id = ?",
+                                [(rng.randint(1, 5), rng.choice(post_ids)) for _ in range(20)],
+                            )
+                        else:
+                            connection.execute(
+                                "INSERT INTO blog_comments (post_id, author_name, content, is_approved, created_at) "
+                                "VALUES (?, 'Бенчмарк', 'Комментарий', 0, datetime('now'))",
+                                (rng.choice(post_ids),),
+                            )
+                except sqlite3.OperationalError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                results["write_latency"].extend(latencies)
+                counters["writes"] += len(latencies)
+                counters["write_errors"] += errors
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        return {
+            "journal_mode": journal_mode,
+            "pragmas": pragmas,
+            "reads_per_s": round(counters["reads"] / duration, 1),
+            "writes_per_s": round(counters["writes"] / duration, 1),
+            "read_p50_ms": round(percentile(results["read_latency"], 50) * 1000, 3),
+            "read_p99_ms": round(percentile(results["read_latency"], 99) * 1000, 3),
+            "write_p50_ms": round(percentile(results["write_latency"], 50) * 1000, 3),
+            "write_p99_ms": round(percentile(results["write_latency"], 99) * 1000, 3),
+            "read_errors": counters["read_errors"],
+            "write_errors": counters["write_errors"],
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Чтение и запись SQLite под нагрузкой для разных профилей PRAGMA")
+    parser.add_argument("--database", default=os.path.join(BASE_DIR, "site.db"))
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд на профиль")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="файл для результатов в JSON")
+    args = parser.parse_args()
+
+    report = {}
+    for name, pragmas in PROFILES.items():
+        pragmas = sqlite_pragmas() if pragmas is None else pragmas
+        print(f"⏱  {name}: {args.readers} читателей, {args.writers} писателей, {args.duration:g} с")
+        report[name] = run_profile(args.database, pragmas, args.readers, args.writers, args.duration, args.seed)
+
+    columns = ("journal_mode", "reads_per_s", "writes_per_s", "read_p50_ms", "read_p99_ms",
+               "write_p50_ms", "write_p99_ms", "read_errors", "write_errors")
+    print(f"{'':<14}" + "".join(f"{name:>12}" for name in report))
+    for column in columns:
+        print(f"{column:<14}" + "".join(f"{str(result[column]):>12}" for result in report.values()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"💾 Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# template_warmup.py - байткод-кэш шаблонов Jinja2 и прогрев при старте воркера
+# Отчет о времени компиляции: python template_warmup.py
+import logging
+import os
+import time
+from typing import List, Tuple
+
+from jinja2 import Environment, FileSystemBytecodeCache, TemplateError
+
+logger = logging.getLogger(__name__)
+
+
+def configure_bytecode_cache(env: Environment, directory: str) -> FileSystemBytecodeCache:
+    """Скомпилированные шаблоны хранятся в общем каталоге - их переиспользуют все воркеры"""
+    os.makedirs(directory, exist_ok=True)
+    env.bytecode_cache = FileSystemBytecodeCache(directory, pattern="%s.jinja.cache")
+    return env.bytecode_cache
+
+
+def precompile_templates(env: Environment) -> List[Tuple[str, float]]:
+    """Загружает все шаблоны заранее; возвращает (имя, секунды) для каждого"""
+    timings = []
+    for name in env.list_templates(extensions=("html",)):
+        started = time.perf_counter()
+        try:
+            env.get_template(name)
+        except TemplateError:
+            logger.exception("Шаблон %s не скомпилирован", name)
+            continue
+        timings.append((name, time.perf_counter() - started))
+    return timings
+
+
+def format_report(timings: List[Tuple[str, float]]) -> str:
+    lines = [f"{seconds * 1000:8.2f} мс  {name}" for name, seconds in sorted(timings, key=lambda item: -item[1])]
+    total = sum(seconds for _, seconds in timings)
+    lines.append(f"{total * 1000:8.2f} мс  всего ({len(timings)} шаблонов)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from main import templates
+
+    # Чистая компиляция без байткод-кэша и загрузка из него
+    cache = templates.env.bytecode_cache
+    templates.env.bytecode_cache = None
+    templates.env.cache.clear()
+    print("Компиляция из исходников:")
+    print(format_report(precompile_templates(templates.env)))
+
+    if cache is not None:
+        templates.env.bytecode_cache = cache
+        templates.env.cache.clear()
+        precompile_templates(templates.env)
+        templates.env.cache.clear()
+        print("\nЗагрузка из байткод-кэша:")
+        print(format_report(precompile_templates(templates.env)))
@@ -0,0 +1,176 @@
+# test_cache_backend.py - реализации кэша, LRU файла SQLite и сбои хранилища
+#
+# Redis заменяет небольшой сервер протокола RESP в потоке теста.
+import fnmatch
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from cache_backend import CacheBackend, MemoryBackend, RedisBackend, SQLiteBackend
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[:1] == b"*"
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _bulk(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            now = time.monotonic()
+            if command == b"GET":
+                value, expires = store.get(args[1], (None, None))
+                if expires is not None and expires <= now:
+                    store.pop(args[1], None)
+                    value = None
+                reply = self._bulk(value)
+            elif command == b"SET":
+                expires = None
+                if len(args) == 5 and args[3].upper() == b"PX":
+                    expires = now + int(args[4]) / 1000
+                store[args[1]] = (args[2], expires)
+                reply = b"+OK\r\n"
+            elif command == b"DEL":
+                reply = b":%d\r\n" % sum(store.pop(key, None) is not None for key in args[1:])
+            elif command == b"SCAN":
+                pattern = args[args.index(b"MATCH") + 1].decode()
+                keys = [key for key in store if fnmatch.fnmatchcase(key.decode(), pattern)]
+                reply = b"*2\r\n" + self._bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(map(self._bulk, keys))
+            elif command in (b"AUTH", b"SELECT", b"PING"):
+                reply = b"+OK\r\n"
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def redis_url():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeRedisHandler)
+    server.daemon_threads = True
+    server.store = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(100)
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "cache.db"), max_entries=100)
+    return RedisBackend(request.getfixturevalue("redis_url"))
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+def test_roundtrip(backend):
+    assert backend.get("missing", "default") == "default"
+    backend.set("home:1", {"salons": [1, 2, 3]})
+    assert backend.get("home:1") == {"salons": [1, 2, 3]}
+    backend.delete("home:1")
+    assert backend.get("home:1") is None
+
+
+def test_ttl(backend):
+    backend.set("short", "value", ttl=0.05)
+    assert backend.get("short") == "value"
+    time.sleep(0.1)
+    assert backend.get("short") is None
+
+
+def test_clear(backend):
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.clear()
+    assert backend.get("a") is None and backend.get("b") is None
+
+
+def test_get_or_set_builds_once(backend):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return "built"
+
+    assert backend.get_or_set("facets:1", build) == "built"
+    assert backend.get_or_set("facets:1", build) == "built"
+    assert len(calls) == 1
+
+
+def test_sqlite_prune_keeps_recently_read(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=2)
+    backend.ACCESS_RESOLUTION = 0.0
+    backend.set("old", 1)
+    time.sleep(0.01)
+    backend.set("middle", 2)
+    time.sleep(0.01)
+    # Чтение делает "old" самой свежей записью - вытесняется "middle"
+    assert backend.get("old") == 1
+    time.sleep(0.01)
+    backend.set("new", 3)
+    backend.prune()
+    assert backend.get("old") == 1
+    assert backend.get("middle") is None
+    assert backend.get("new") == 3
+
+
+def test_redis_down_is_a_miss():
+    backend = RedisBackend(f"redis://127.0.0.1:{_free_port()}/0", timeout=0.5)
+    calls = []
+
+    def build():
+        calls.append(1)
+        return "built"
+
+    assert backend.get_or_set("home:1", build) == "built"
+    assert backend.safe_get("home:1", "default") == "default"
+    assert backend.safe_set("home:1", "value") is False
+    # Повторные обращения не ждут подключения, пока не прошла пауза
+    started = time.monotonic()
+    assert backend.get_or_set("home:1", build) == "built"
+    assert time.monotonic() - started < 0.1
+    assert len(calls) == 2
+
+
+def test_locked_sqlite_is_a_miss(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+
+    def locked(*args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+    backend.get = locked
+    backend.set = locked
+    assert backend.get_or_set("blog-taxonomy:1", lambda: "built") == "built"
+    assert backend.safe_set("blog-taxonomy:1", "built") is False
@@ -0,0 +1,90 @@
+# test_catalog_snapshot.py - снимок каталога фильтрует, сортирует и считает фасеты как SQL
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+import models
+from catalog_snapshot import load_snapshot
+from facets import get_salon_facets
+from pagination import SALON_SORTS, keyset_order
+
+SALONS = [
+    ("Салон Лак", "Ногтевой сервис", "Ленинский", 4.5, 10),
+    ("салон лак", "ногтевой сервис", "ленинский", None, 3),
+    ("Studio Nail", "Nail Studio", "Ленинский", 0.0, None),
+    ("Барбершоп", "Барбершоп", "Октябрьский", 4.5, 10),
+    (None, "nail studio", "Октябрьский", 3.0, 7),
+    ("Elegia", None, None, None, None),
+    ("Борода", "Барбершоп", "октябрьский", 5.0, 2),
+]
+
+FILTERS = [
+    {},
+    {"category": "nail studio"},
+    {"category": "НОГТЕВОЙ СЕРВИС"},
+    {"category": "Ногтевой сервис"},
+    {"district": "Октябрьский"},
+    {"district": "ленинский", "min_rating": 0.0},
+    {"min_rating": 0.0},
+    {"min_rating": 4.5},
+]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for number, (name, category, district, rating, reviews) in enumerate(SALONS, start=1):
+            session.add(models.Salon(
+                id=number, name=name, category=category, district=district,
+                rating=rating, reviews_count=reviews,
+            ))
+        session.commit()
+        yield session
+
+
+def _sql_filter(db, category=None, district=None, min_rating=None):
+    # Те же условия, что в /catalog без снимка
+    query = db.query(models.Salon)
+    if category:
+        query = query.filter(func.lower(models.Salon.category) == func.lower(category))
+    if district:
+        query = query.filter(func.lower(models.Salon.district) == func.lower(district))
+    if min_rating is not None:
+        query = query.filter(models.Salon.rating >= min_rating)
+    return query
+
+
+@pytest.mark.parametrize("sort_by", sorted(SALON_SORTS))
+@pytest.mark.parametrize("filters", FILTERS)
+def test_filter_matches_sql(db, filters, sort_by):
+    snapshot = load_snapshot(db)
+    expected = _sql_filter(db, **filters).order_by(*keyset_order(SALON_SORTS[sort_by])).all()
+    matched = snapshot.filter(sort_by=sort_by, **filters)
+    assert [salon.id for salon in matched] == [salon.id for salon in expected]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_facets_match_sql(db, filters):
+    snapshot = load_snapshot(db)
+    assert snapshot.facets(**filters) == get_salon_facets(db, **filters)
+
+
+def test_search_matches_sql_lower(db):
+    snapshot = load_snapshot(db)
+    for term in ("NAIL", "Лак", "ЛАК"):
+        expected = db.query(models.Salon).filter(
+            func.lower(models.Salon.name).contains(func.lower(term))
+            | func.lower(models.Salon.category).contains(func.lower(term))
+        ).order_by(models.Salon.id).all()
+        assert [salon.id for salon in snapshot.search(term)] == [salon.id for salon in expected]
+
+
+@pytest.mark.parametrize("category", ["ногтевой сервис", "НОГТЕВОЙ СЕРВИС", "NAIL STUDIO"])
+def test_facet_counts_match_filter(db, category):
+    # Счетчик района в фасетах - столько же салонов, сколько вернет фильтр
+    facets = get_salon_facets(db, category=category)
+    for district, count in facets["district_counts"].items():
+        assert count == _sql_filter(db, category=category, district=district).count()
+    assert facets["all_districts_count"] == _sql_filter(db, category=category).count()
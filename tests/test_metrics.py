@@ -0,0 +1,64 @@
+# test_metrics.py - метрики пула по событиям, файлы воркеров и доступ к /metrics
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+import config
+import metrics
+
+
+def test_pool_events(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'site.db'}", poolclass=QueuePool)
+    metrics.instrument_pool(engine, "test")
+    with engine.connect():
+        assert metrics.pool_in_use.values[("test",)] == 1
+    assert metrics.pool_in_use.values[("test",)] == 0
+    # После dispose() слушатели работают и на новом пуле
+    engine.dispose()
+    with engine.connect() as connection:
+        connection.invalidate()
+    assert metrics.pool_in_use.values[("test",)] == 0
+    assert sum(metrics.pool_hold.values[("test",)][0]) == 2
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_stale_worker_files(tmp_path):
+    directory = str(tmp_path)
+    dead, live = _dead_pid(), os.getppid()
+    for pid in (dead, live, os.getpid()):
+        with open(metrics._path(directory, pid), "w", encoding="utf-8") as file:
+            json.dump({"http_requests_total": {"GET\x1f/\x1f200": 5}}, file)
+
+    # Файл упавшего воркера не суммируется, свой - берется из памяти
+    merged = metrics.collect(directory)["http_requests_total"]
+    assert merged.get("GET\x1f/\x1f200") == 5
+
+    metrics.clear_stale(directory)
+    assert os.listdir(directory) == [os.path.basename(metrics._path(directory, live))]
+
+    metrics.flush(directory)
+    metrics.remove_own(directory)
+    assert len(os.listdir(directory)) == 1
+
+
+def test_scrape_allowed(monkeypatch):
+    def request(host, authorization=""):
+        return SimpleNamespace(client=SimpleNamespace(host=host), headers={"authorization": authorization})
+
+    monkeypatch.setattr(config, "METRICS_TOKEN", None)
+    assert metrics.scrape_allowed(request("127.0.0.1"))
+    assert not metrics.scrape_allowed(request("10.0.0.5"))
+
+    monkeypatch.setattr(config, "METRICS_TOKEN", "secret")
+    assert metrics.scrape_allowed(request("10.0.0.5", "Bearer secret"))
+    assert not metrics.scrape_allowed(request("127.0.0.1", "Bearer wrong"))
@@ -0,0 +1,104 @@
+# test_pagination.py - курсорная пагинация совпадает с OFFSET, в том числе при NULL в ключе,
+# и ищет страницу по индексу сортировки
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+import models
+from pagination import (
+    InvalidCursor, SALON_SORTS, decode_cursor, encode_cursor, keyset_filter, keyset_order, keyset_page, row_key,
+    snapshot_page,
+)
+
+RATINGS = [4.5, None, 3.0, 4.5, None, 5.0, 0.0, 3.0, None, 4.0, 4.5]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        # Core, а не ORM: иначе вместо None подставятся значения по умолчанию
+        session.execute(insert(models.Salon.__table__), [
+            {
+                "id": number, "name": None if number == 4 else f"Салон {number % 4}",
+                "category": "Парикмахерская", "district": "Центральный",
+                "rating": rating, "reviews_count": None if number % 3 == 0 else number,
+            }
+            for number, rating in enumerate(RATINGS, start=1)
+        ])
+        session.commit()
+        yield session
+
+
+def _walk(query, keys, limit=3):
+    pages, after = [], None
+    while True:
+        items, after = keyset_page(query, keys, after, limit)
+        pages.extend(item.id for item in items)
+        if after is None:
+            return pages
+
+
+@pytest.mark.parametrize("sort_by", sorted(SALON_SORTS))
+def test_keyset_matches_offset(db, sort_by):
+    keys = SALON_SORTS[sort_by]
+    query = db.query(models.Salon)
+    expected = [salon.id for salon in query.order_by(*keyset_order(keys)).all()]
+    assert len(expected) == len(RATINGS)
+    assert _walk(query, keys) == expected
+
+
+@pytest.mark.parametrize("sort_by", sorted(SALON_SORTS))
+def test_snapshot_matches_keyset(db, sort_by):
+    keys = SALON_SORTS[sort_by]
+    items = db.query(models.Salon).order_by(*keyset_order(keys)).all()
+    pages, after = [], None
+    while True:
+        page, after = snapshot_page(items, keys, after, 4)
+        pages.extend(item.id for item in page)
+        if after is None:
+            break
+    assert pages == [item.id for item in items]
+
+
+def test_snapshot_cursor_of_removed_item_continues(db):
+    keys = SALON_SORTS["rating"]
+    items = db.query(models.Salon).order_by(*keyset_order(keys)).all()
+    page, after = snapshot_page(items, keys, None, 3)
+    # Последняя запись страницы исчезла из снимка - продолжаем с места, а не с начала
+    remaining = [item for item in items if item.id != page[-1].id]
+    next_page, _ = snapshot_page(remaining, keys, after, 3)
+    assert [item.id for item in next_page] == [item.id for item in items[3:6]]
+
+
+def test_null_sort_values_use_substitute(db):
+    keys = SALON_SORTS["popular"]
+    salon = db.get(models.Salon, 3)
+    assert row_key(salon, keys) == [3.0, models.REVIEWS_UNSET, 3]
+    assert decode_cursor(encode_cursor(row_key(salon, keys)), keys) == [3.0, -1, 3]
+
+
+@pytest.mark.parametrize("token", [
+    "not-base64!", encode_cursor([1, 2, 3]), encode_cursor(["x", 1]), encode_cursor([4.5, None]),
+    encode_cursor([None, 3]),
+])
+def test_invalid_cursor(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, SALON_SORTS["rating"])
+
+
+@pytest.mark.parametrize("sort_by", sorted(SALON_SORTS))
+def test_cursor_page_seeks_index(db, sort_by):
+    # Страница после курсора - поиск по индексу, без сортировки во временном B-дереве
+    keys = SALON_SORTS[sort_by]
+    salon = db.get(models.Salon, 5)
+    statement = (
+        db.query(models.Salon)
+        .filter(keyset_filter(keys, row_key(salon, keys)))
+        .order_by(*keyset_order(keys))
+        .limit(7)
+        .statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    )
+    plan = [row[3] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}")]
+    assert len(plan) == 1 and plan[0].startswith("SEARCH salons USING INDEX ix_salons_sort_"), plan
@@ -0,0 +1,75 @@
+# test_query_counts.py - число SQL-выражений на страницу (счетчик sql_profiler)
+#
+# Каждая страница открывается в отдельном процессе на копии site.db: настройки
+# (RAISE_ON_LAZY_LOAD, SQL_PROFILING, кэш ответов) читаются при импорте main, а
+# холодные кэши не зависят от порядка страниц. Ленивая загрузка связи - ошибка 500.
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Путь -> (выражений при холодных кэшах, при повторном открытии)
+PAGES = {
+    "/": (11, 1),
+    "/catalog": (6, 3),
+    "/catalog?page=2": (6, 3),
+    "/catalog/1": (3, 3),
+    "/blog": (5, 2),
+    "/blog/kak-vybrat-salon-krasoty-7-vazhnykh-kriteriev": (7, 6),
+}
+
+SCRIPT = """
+import json, sys
+from fastapi.testclient import TestClient
+from database import engine
+from migrations import prepare_database
+prepare_database(engine)
+import main
+
+counts = []
+with TestClient(main.app) as client:
+    for _ in range(2):
+        response = client.get(sys.argv[1])
+        assert response.status_code == 200, response.status_code
+        counts.append(response.headers["server-timing"])
+print(json.dumps(counts))
+"""
+
+QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+@pytest.fixture(scope="module")
+def database(tmp_path_factory):
+    path = tmp_path_factory.mktemp("query_counts") / "site.db"
+    shutil.copyfile(os.path.join(ROOT, "site.db"), path)
+    return path
+
+
+def _statement_counts(database, path: str) -> list:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{database}",
+        RAISE_ON_LAZY_LOAD="1",
+        SQL_PROFILING="1",
+        RESPONSE_CACHE="0",
+        CACHE_BACKEND="memory",
+        METRICS="0",
+    )
+    env.pop("ASYNC_DATABASE_URL", None)
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT, path], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return [int(QUERIES.search(timing).group(1)) for timing in timings]
+
+
+@pytest.mark.parametrize("path", sorted(PAGES))
+def test_statement_count(database, path):
+    assert tuple(_statement_counts(database, path)) == PAGES[path]
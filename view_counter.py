@@ -0,0 +1,84 @@
+# view_counter.py - буферизованный счетчик просмотров статей блога
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import case, event, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+import config
+import models
+from writer import write_queue
+
+
+class ViewCounter:
+    """Копит просмотры в памяти воркера и сбрасывает их одним UPDATE"""
+
+    def __init__(self, flush_interval: float, flush_hits: int):
+        self.flush_interval = flush_interval
+        self.flush_hits = flush_hits
+        self._pending: Dict[int, int] = {}
+        self._hits = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def hit(self, post_id: int):
+        with self._lock:
+            self._pending[post_id] = self._pending.get(post_id, 0) + 1
+            self._hits += 1
+            due = (
+                self._hits >= self.flush_hits
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def pending(self) -> Dict[int, int]:
+        with self._lock:
+            return dict(self._pending)
+
+    def pending_for(self, post_id: int) -> int:
+        return self._pending.get(post_id, 0)
+
+    def flush(self) -> int:
+        """Записывает накопленные просмотры; возвращает число обновленных статей"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._hits = 0
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        table = models.BlogPost.__table__
+        statement = (
+            update(table)
+            .where(table.c.id.in_(list(pending)))
+            .values(
+                views_count=table.c.views_count
+                + case(pending, value=table.c.id, else_=0),
+                # Просмотры - не правка статьи: updated_at (onupdate) не трогаем
+                updated_at=table.c.updated_at,
+            )
+        )
+
+        def restore(future):
+            # Не теряем просмотры - вернем их в буфер до следующей попытки
+            if future.exception() is not None:
+                with self._lock:
+                    for post_id, count in pending.items():
+                        self._pending[post_id] = self._pending.get(post_id, 0) + count
+
+        # UPDATE уходит в очередь писателя и фиксируется вместе с соседними записями
+        write_queue.submit(lambda session: session.execute(statement)).add_done_callback(restore)
+        return len(pending)
+
+
+view_counter = ViewCounter(config.VIEW_FLUSH_INTERVAL, config.VIEW_FLUSH_HITS)
+
+
+@event.listens_for(models.BlogPost, "load")
+def _apply_pending_views(post, context):
+    # Загруженная статья сразу показывает еще не записанные просмотры этого воркера
+    pending = view_counter.pending_for(post.id)
+    if pending and post.views_count is not None:
+        set_committed_value(post, "views_count", post.views_count + pending)
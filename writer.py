@@ -0,0 +1,141 @@
+# writer.py - единственный писатель в базу: очередь записей с групповым commit
+#
+# SQLite допускает одного писателя; вместо того чтобы потоки и воркеры спорили за
+# блокировку базы, все записи приложения выполняет один поток со своим соединением.
+# Задачи, пришедшие почти одновременно, выполняются каждая в своем SAVEPOINT и
+# фиксируются одним COMMIT: ошибка одной задачи не откатывает остальные.
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, sessionmaker
+
+import config
+from database import WriteSessionLocal
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[Session], Any]
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Очередь задач записи; задача - функция от сессии писателя, без commit"""
+
+    def __init__(self, session_factory: sessionmaker, max_batch: int = 64, max_delay: float = 0.002):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Дописывает уже поставленные задачи и останавливает поток"""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+            thread.join(timeout)
+            self._thread = None
+        # Задачи, поставленные последней пачкой (after_commit), - уже в этом потоке
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftovers.append(item)
+        if leftovers:
+            self._execute(leftovers)
+
+    def submit(self, job: Job) -> Future:
+        """Ставит задачу в очередь; без запущенного писателя выполняет ее сразу в этом потоке"""
+        future: Future = Future()
+        if self.running:
+            # В том числе из самого писателя (например, из after_commit) - следующей пачкой
+            self._queue.put((job, future))
+        else:
+            self._execute([(job, future)])
+        return future
+
+    def call(self, job: Job) -> Any:
+        """Синхронная запись с ожиданием результата"""
+        if self.running and threading.current_thread() is self._thread:
+            raise RuntimeError("Ожидание записи из потока писателя приведет к взаимоблокировке")
+        return self.submit(job).result()
+
+    async def run(self, job: Job) -> Any:
+        """Запись из асинхронного обработчика: цикл событий не блокируется"""
+        return await asyncio.wrap_future(self.submit(job))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.max_delay
+            # Добираем задачи, пришедшие за max_delay, - они уйдут одним commit
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._execute(batch)
+            if stop:
+                return
+
+    def _execute(self, batch: List[Tuple[Job, Future]]):
+        results = []
+        session = self.session_factory()
+        try:
+            for job, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with session.begin_nested():
+                        results.append((future, job(session)))
+                except Exception as error:
+                    # Задачи из after_commit никто не ждет - без журнала ошибка потерялась бы
+                    logger.exception("Задача записи завершилась с ошибкой")
+                    future.set_exception(error)
+            session.commit()
+        except Exception as error:
+            logger.exception("Не удалось зафиксировать пачку записей (%d)", len(results))
+            session.rollback()
+            for future, _ in results:
+                future.set_exception(error)
+            return
+        finally:
+            session.close()
+
+        for future, result in results:
+            future.set_result(result)
+
+
+write_queue = WriteQueue(WriteSessionLocal, config.WRITE_BATCH_SIZE, config.WRITE_BATCH_DELAY)